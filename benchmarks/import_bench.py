@@ -0,0 +1,78 @@
+"""Cold-start benchmark: how long ``import server`` / ``import main`` take.
+
+Each import runs in a fresh interpreter (``python -X importtime``) so nothing is
+cached in-process. Reports median wall time, the slowest top-level imports,
+and whether heavy modules that should load lazily were pulled in.
+
+    python -m benchmarks.import_bench --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported just to start the server
+LAZY_MODULES = ("matplotlib", "numpy", "flask", "flask_cors")
+
+_PROBE = (
+    "import sys, json; import {module}; "
+    "print(json.dumps([m for m in {lazy!r} if m in sys.modules]))"
+)
+
+
+def _run(module):
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "import-benchmark"))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return time.perf_counter() - start, proc.stdout.strip().splitlines()[-1], proc.stderr
+
+
+def _top_imports(importtime_log, limit):
+    """Slowest top-level imports (cumulative µs) from -X importtime output."""
+    rows = []
+    for line in importtime_log.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match and len(match.group(2)) <= 2:
+            rows.append((int(match.group(1)), match.group(3).strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def bench(module, runs, top):
+    timings, loaded, log = [], "[]", ""
+    for _ in range(runs):
+        elapsed, loaded, log = _run(module)
+        timings.append(elapsed)
+    return {
+        "module": module,
+        "median_s": round(statistics.median(timings), 3),
+        "min_s": round(min(timings), 3),
+        "eager_heavy_modules": loaded,
+        "top_imports": _top_imports(log, top),
+    }
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("modules", nargs="*", default=["server", "main"])
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        r = bench(module, args.runs, args.top)
+        print(f"\nimport {r['module']}: median {r['median_s']} s (min {r['min_s']} s), "
+              f"heavy modules loaded eagerly: {r['eager_heavy_modules']}")
+        for micros, name in r["top_imports"]:
+            print(f"  {micros / 1000:>9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main_cli()
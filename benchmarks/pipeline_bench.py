@@ -0,0 +1,306 @@
+"""Offline benchmark for the chat pipeline.
+
+Swaps ``agents.Runner`` for a deterministic stand-in with configurable latency
+and canned outputs, replays a corpus of NBA queries through the Flask and
+FastAPI entry points, and reports throughput, latency percentiles, per-stage
+breakdown and peak memory. No OpenAI calls are made.
+
+    python -m benchmarks.pipeline_bench --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from openai.types.responses import ResponseTextDeltaEvent
+
+import main
+from metrics import metrics
+from vizualization_utils import generate_chart_from_json
+
+QUERY_CORPUS = [
+    "Compare LeBron James vs Stephen Curry points this season",
+    "Nikola Jokic triple doubles 2024-25",
+    "Who leads the NBA in assists?",
+    "Victor Wembanyama blocks per game trend",
+    "Giannis vs Embiid rebounds and points comparison",
+    "Luka Doncic career points progression chart",
+    "Celtics vs Lakers head to head record",
+    "Top 5 three point shooters by percentage",
+    "Anthony Edwards stats last 10 games",
+    "Shai Gilgeous-Alexander scoring average 2024-25",
+    "Kevin Durant career field goal percentage",
+    "Who won the 2024 NBA Finals?",
+    "Jayson Tatum vs Jaylen Brown points rebounds assists",
+    "Tyrese Haliburton assists leaders ranking",
+    "Warriors team stats over time",
+    "Stephen Curry three pointers made by season",
+    "Joel Embiid points per game graph",
+    "Rookie of the year race stats",
+    "Devin Booker vs Donovan Mitchell shooting",
+    "LeBron James career points",
+]
+
+PLAYERS = ["LeBron James", "Stephen Curry", "Nikola Jokic", "Giannis Antetokounmpo", "Luka Doncic"]
+
+# Mean simulated latency (seconds) per agent
+DEFAULT_LATENCY = {"search": 1.2, "data": 0.8, "viz": 0.6, "orchestrator": 1.5}
+
+
+def _stage_of(agent):
+    name = agent.name.lower()
+    for stage in ("search", "data", "visualization", "orchestrator"):
+        if stage in name:
+            return "viz" if stage == "visualization" else stage
+    return "orchestrator"
+
+
+def _canned_output(stage, prompt):
+    """Deterministic, prompt-dependent output shaped like the real agents'."""
+    seed = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    players = rng.sample(PLAYERS, 2)
+    if stage == "search":
+        return "\n".join(
+            f"- {p}: {rng.uniform(18, 32):.1f} PPG, {rng.uniform(4, 12):.1f} RPG (nba.com)" for p in players
+        )
+    if stage == "data":
+        records = [
+            {"player": p, "season": "2024-25", "ppg": round(rng.uniform(18, 32), 1),
+             "rpg": round(rng.uniform(4, 12), 1), "apg": round(rng.uniform(2, 10), 1)}
+            for p in players
+        ]
+        return f"```json\n{json.dumps(records)}\n```"
+    if stage == "viz":
+        data = {"labels": ["PPG", "RPG", "APG"]}
+        for p in players:
+            data[p] = [round(rng.uniform(2, 32), 1) for _ in range(3)]
+        return f"```json\n{json.dumps({'title': ' vs '.join(players), 'data': data})}\n```"
+    return " ".join(rng.choice(["He", "averaged", "points", "this", "season", "and", "leads"]) for _ in range(60))
+
+
+class StubRunner:
+    """Drop-in for ``agents.Runner`` with simulated latency and usage."""
+
+    def __init__(self, latency=None, jitter=0.2, seed=7):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    def _delay(self, stage):
+        base = self.latency.get(stage, 0.0)
+        return max(0.0, base * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+    @staticmethod
+    def _usage(prompt, output):
+        return SimpleNamespace(requests=1, input_tokens=len(prompt) // 4, output_tokens=len(output) // 4)
+
+    async def run(self, agent, prompt, **kwargs):
+        stage = _stage_of(agent)
+        await asyncio.sleep(self._delay(stage))
+        output = _canned_output(stage, prompt)
+        return SimpleNamespace(
+            final_output=output,
+            context_wrapper=SimpleNamespace(usage=self._usage(prompt, output)),
+        )
+
+    def run_streamed(self, agent, prompt, **kwargs):
+        stage = _stage_of(agent)
+        output = _canned_output(stage, prompt)
+        delay = self._delay(stage)
+        usage = self._usage(prompt, output)
+
+        class _Streamed:
+            final_output = None
+            context_wrapper = SimpleNamespace(usage=usage)
+
+            async def stream_events(self):
+                words = output.split(" ")
+                for word in words:
+                    await asyncio.sleep(delay / len(words))
+                    yield SimpleNamespace(
+                        type="raw_response_event",
+                        data=ResponseTextDeltaEvent.model_construct(
+                            type="response.output_text.delta", delta=word + " "
+                        ),
+                    )
+                self.final_output = output
+
+        return _Streamed()
+
+
+@contextmanager
+def stubbed_runner(runner):
+    original = main.Runner
+    main.Runner = runner
+    try:
+        yield runner
+    finally:
+        main.Runner = original
+
+
+def make_bot(warm_caches=False):
+    """Fresh chatbot; caches and the stats store are off unless ``warm_caches``."""
+    bot = main.NBAStatsChatbot()
+    bot.chart_store.save_to_disk = False
+    if not warm_caches:
+        bot.caches = {}
+        bot.stats_store = None
+    return bot
+
+
+def _percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": round(pct(50), 1),
+        "p95_ms": round(pct(95), 1),
+        "p99_ms": round(pct(99), 1),
+        "mean_ms": round(statistics.fmean(ordered), 1),
+    }
+
+
+def _report(name, latencies_ms, wall_s, peak_bytes):
+    stages = metrics.snapshot()["latency"]
+    return {
+        "scenario": name,
+        "requests": len(latencies_ms),
+        "throughput_rps": round(len(latencies_ms) / wall_s, 2),
+        **_percentiles(latencies_ms),
+        "peak_memory_mb": round(peak_bytes / 1e6, 2),
+        "stages": {k: {m: v[m] for m in ("count", "p50_ms", "p95_ms", "p99_ms")} for k, v in stages.items()},
+    }
+
+
+def _queries(n):
+    return [QUERY_CORPUS[i % len(QUERY_CORPUS)] + ("" if i < len(QUERY_CORPUS) else f" #{i}") for i in range(n)]
+
+
+def bench_flask(n_requests, concurrency, warm_caches=False):
+    """Flask /chat through the test client, one thread per concurrent user."""
+    client = main.create_app(make_bot(warm_caches)).test_client()
+    client.post("/chat", json={"message": "warm up chart renderer"})
+    metrics.reset()
+
+    def one(query):
+        start = time.perf_counter()
+        response = client.post("/chat", json={"message": query})
+        assert response.status_code == 200, response.data
+        return (time.perf_counter() - start) * 1000
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(one, _queries(n_requests)))
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _report("flask /chat", latencies, wall, peak)
+
+
+def bench_fastapi(n_requests, concurrency, warm_caches=False, path="/chat"):
+    """FastAPI endpoint over an in-process ASGI transport."""
+    import httpx
+    import server
+
+    server.chatbot = make_bot(warm_caches)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await client.post(path, json={"message": "warm up chart renderer"})
+            metrics.reset()
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one(query):
+                async with limit:
+                    start = time.perf_counter()
+                    response = await client.post(path, json={"message": query})
+                    assert response.status_code == 200, response.text
+                    return (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(one(q) for q in _queries(n_requests)))
+            return latencies, time.perf_counter() - start
+
+    tracemalloc.start()
+    latencies, wall = asyncio.run(run())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _report(f"fastapi {path}", latencies, wall, peak)
+
+
+def bench_charts(n_charts, concurrency):
+    """generate_chart_from_json alone, from a thread pool."""
+    specs = [json.loads(_canned_output("viz", q).strip("`json\n"))["data"] for q in _queries(n_charts)]
+    generate_chart_from_json(specs[0])
+    metrics.reset()
+
+    def one(spec):
+        start = time.perf_counter()
+        generate_chart_from_json(spec)
+        return (time.perf_counter() - start) * 1000
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(one, specs))
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _report("generate_chart_from_json", latencies, wall, peak)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="Multiplier on DEFAULT_LATENCY (1.0 ~ real OpenAI round-trips)")
+    parser.add_argument("--entry", choices=("flask", "fastapi", "stream", "charts", "all"), default="all")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep response caches and stats store on")
+    parser.add_argument("--json", action="store_true", help="Print raw JSON reports")
+    args = parser.parse_args(argv)
+
+    runner = StubRunner({k: v * args.latency_scale for k, v in DEFAULT_LATENCY.items()})
+    reports = []
+    with stubbed_runner(runner):
+        if args.entry in ("flask", "all"):
+            reports.append(bench_flask(args.requests, args.concurrency, args.warm_caches))
+        if args.entry in ("fastapi", "all"):
+            reports.append(bench_fastapi(args.requests, args.concurrency, args.warm_caches))
+        if args.entry in ("stream", "all"):
+            reports.append(bench_fastapi(args.requests, args.concurrency, args.warm_caches, "/chat/stream"))
+        if args.entry in ("charts", "all"):
+            reports.append(bench_charts(args.requests, args.concurrency))
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return reports
+
+    for r in reports:
+        print(
+            f"\n{r['scenario']}: {r['requests']} req, {r['throughput_rps']} req/s, "
+            f"p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, p99 {r['p99_ms']} ms, "
+            f"peak {r['peak_memory_mb']} MB"
+        )
+        for stage, s in sorted(r["stages"].items()):
+            print(f"  {stage:<22} n={s['count']:<5} p50 {s['p50_ms']:>8} ms  p95 {s['p95_ms']:>8} ms")
+    return reports
+
+
+if __name__ == "__main__":
+    main_cli()
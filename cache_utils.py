@@ -0,0 +1,117 @@
+import asyncio
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+_MISSING = object()
+
+# Query words whose answer changes within hours ("who won tonight"); such
+# queries are cached only briefly and never answered from stored stats
+LIVE_KEYWORDS = (
+    "tonight", "today", "yesterday", "last night", "live", "current",
+    "latest", "right now", "this week", "score", "injury", "injured", "trade",
+)
+LIVE_RE = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in LIVE_KEYWORDS) + r")\b")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key: lowercase, no punctuation, single spaces."""
+    query = re.sub(r"[^\w\s%.-]", " ", (query or "").lower())
+    return re.sub(r"\s+", " ", query).strip(" .-")
+
+
+def is_time_sensitive(query: str) -> bool:
+    """True when the query mentions a LIVE_KEYWORDS word (whole words only)."""
+    return LIVE_RE.search(normalize_query(query)) is not None
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl_seconds``."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """Store ``value``; ``ttl_seconds`` overrides the cache-wide TTL for this entry."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller starts ``factory()`` as a task; callers arriving while it
+    runs await the same task. Tasks are tracked per event loop, and shielded so
+    a cancelled caller doesn't cancel the work others are waiting on.
+    """
+
+    def __init__(self):
+        self._inflight = weakref.WeakKeyDictionary()  # loop -> {key: Task}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, factory):
+        loop = asyncio.get_running_loop()
+        calls = self._inflight.setdefault(loop, {})
+        task = calls.get(key)
+        if task is None:
+            task = loop.create_task(factory())
+            calls[key] = task
+            task.add_done_callback(lambda t: calls.pop(key) if calls.get(key) is t else None)
+            self.executed += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": sum(len(calls) for calls in self._inflight.values()),
+            "executed": self.executed,
+            "shared": self.shared,
+        }
@@ -0,0 +1,113 @@
+import os
+import re
+import threading
+import time
+
+from cache_utils import TTLCache
+from config import (
+    VIZ_CONFIG,
+    CACHE_EXPIRY_HOURS,
+    CHART_MEMORY_ENTRIES,
+    CHART_DISK_MAX_FILES,
+    CHART_DISK_MAX_AGE_HOURS,
+)
+
+CHART_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+PRUNE_EVERY = 100  # Saves between sweeps of the chart directory
+
+
+def chart_url(chart_id):
+    return f"/charts/{chart_id}.png" if chart_id else None
+
+
+class ChartStore:
+    """Content-addressed PNG store: in-memory LRU in front of files in output_dir.
+
+    Charts are keyed by the sha256 of their normalized spec, so identical specs
+    render once and the id doubles as a strong ETag. Files older than
+    ``max_age_hours`` or beyond the newest ``max_files`` are swept on save.
+    """
+
+    def __init__(
+        self,
+        output_dir=VIZ_CONFIG["output_dir"],
+        max_entries=CHART_MEMORY_ENTRIES,
+        save_to_disk=None,
+        max_files=CHART_DISK_MAX_FILES,
+        max_age_hours=CHART_DISK_MAX_AGE_HOURS,
+    ):
+        self.output_dir = os.path.join(output_dir, "charts")
+        # Multi-worker deployments need files: any worker may serve /charts/<id>.png
+        self.save_to_disk = VIZ_CONFIG["save_charts"] if save_to_disk is None else save_to_disk
+        self.memory = TTLCache(max_entries, CACHE_EXPIRY_HOURS * 3600)
+        self.max_files = max_files
+        self.max_age_seconds = max_age_hours * 3600
+        self._saves = 0
+        self._lock = threading.Lock()
+
+    def _path(self, chart_id):
+        return os.path.join(self.output_dir, f"{chart_id}.png")
+
+    def get(self, chart_id):
+        """PNG bytes for ``chart_id`` or None."""
+        if not chart_id or not CHART_ID_RE.match(chart_id):
+            return None
+
+        png = self.memory.get(chart_id)
+        if png is not None:
+            return png
+
+        if self.save_to_disk:
+            try:
+                with open(self._path(chart_id), "rb") as f:
+                    png = f.read()
+            except FileNotFoundError:
+                return None
+            self.memory.set(chart_id, png)
+        return png
+
+    def contains(self, chart_id):
+        """Cheap existence check that doesn't read the PNG from disk."""
+        if self.memory.get(chart_id) is not None:
+            return True
+        return self.save_to_disk and os.path.exists(self._path(chart_id))
+
+    def save(self, chart_id, png):
+        """Store PNG bytes rendered elsewhere (e.g. by the render service)."""
+        self.memory.set(chart_id, png)
+        if self.save_to_disk:
+            os.makedirs(self.output_dir, exist_ok=True)
+            # Write-then-rename so concurrent readers never see a partial file
+            tmp_path = f"{self._path(chart_id)}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, self._path(chart_id))
+            with self._lock:
+                self._saves += 1
+                sweep = self._saves % PRUNE_EVERY == 1  # First save after start-up, then every PRUNE_EVERY
+            if sweep:
+                self.prune()
+
+    def prune(self) -> int:
+        """Delete expired PNGs, then the oldest beyond ``max_files``; returns files removed."""
+        try:
+            entries = [e for e in os.scandir(self.output_dir) if e.name.endswith(".png")]
+        except FileNotFoundError:
+            return 0
+        files = []
+        for entry in entries:
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue  # Removed by another worker's sweep
+        files.sort(reverse=True)
+        cutoff = time.time() - self.max_age_seconds
+        stale = [path for i, (mtime, path) in enumerate(files) if mtime < cutoff or i >= self.max_files]
+        removed = 0
+        for path in stale:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
@@ -7,9 +7,30 @@ load_dotenv()
 # API Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-# Model Configuration
-DEFAULT_MODEL = "gpt-4o-mini"
-ORCHESTRATOR_MODEL = "gpt-4o"
+# Model Configuration (overridable from the environment without a code change)
+DEFAULT_MODEL = os.getenv("NBA_DEFAULT_MODEL", "gpt-4o-mini")
+ORCHESTRATOR_MODEL = os.getenv("NBA_ORCHESTRATOR_MODEL", "gpt-4o")
+
+# Orchestrator routing: simple lookups get the cheaper model with a tighter cap,
+# multi-entity comparisons get ORCHESTRATOR_MODEL
+MODEL_ROUTING = {
+    'enabled': os.getenv("NBA_MODEL_ROUTING", "1") != "0",
+    'simple_model': DEFAULT_MODEL,
+    'simple_max_tokens': 800,
+    'complex_model': ORCHESTRATOR_MODEL,
+    'complex_keywords': [  # Whole words
+        'compare', 'comparison', 'vs', 'versus', 'against', 'head to head',
+        'better', 'difference', 'ranking', 'rank', 'leaders', 'top', 'all-time',
+        'greatest', 'goat', 'why', 'analysis', 'predict', 'prediction'
+    ],
+    'max_simple_entities': 1  # More named players/teams than this => complex
+}
+
+# USD per 1M tokens, used to estimate per-stage cost in /metrics
+MODEL_PRICING = {
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "output": 10.00},
+}
 
 # Search Configuration
 TRUSTED_NBA_SOURCES = [
@@ -40,6 +61,10 @@ AGENT_CONFIG = {
     'orchestrator': {
         'temperature': 0.3,
         'max_tokens': 4000
+    },
+    'prediction_agent': {
+        'temperature': 0.1,
+        'max_tokens': 1500
     }
 }
 
@@ -49,15 +74,112 @@ VIZ_CONFIG = {
     'output_dir': './outputs',
     'chart_style': 'seaborn',
     'default_figsize': (10, 6),
-    'dpi': 300
+    'dpi': 300,
+    'render_threads': 4  # Chart render threads when RENDER_CONFIG['use_processes'] is off
 }
 
-# Create output directory if it doesn't exist
-os.makedirs(VIZ_CONFIG['output_dir'], exist_ok=True)
+# Chart Render Service (worker processes keep matplotlib off the request path)
+RENDER_CONFIG = {
+    'use_processes': True,
+    'workers': 2,
+    'max_pending': 32,      # Renders queued beyond this are skipped (no chart)
+    'timeout_seconds': 10
+}
+
+# Server Settings
+MAX_CONCURRENT_QUERIES = 32  # In-flight pipelines per event loop (per worker)
+# True: orchestrator waits for the viz JSON as extra context (richer answer).
+# False: viz agent and orchestrator run concurrently (one LLM round-trip faster).
+WAIT_FOR_VIZ_CONTEXT = False
+
+# Upstream model calls (see upstream.py). Note the OpenAI client also retries
+# connection errors internally before a failure reaches this layer.
+UPSTREAM_CONFIG = {
+    'requests_per_minute': {'default': 500, 'gpt-4o-mini': 1000},  # Token bucket per model
+    'burst': 20,
+    'stage_timeouts': {  # Seconds per attempt
+        'search': 45, 'data': 30, 'data_batch': 60, 'viz': 20, 'orchestrator': 45, 'default': 30
+    },
+    'max_attempts': 3,
+    'backoff_base_seconds': 0.5,
+    'backoff_max_seconds': 8,
+    'breaker_failure_threshold': 5,  # Consecutive failed attempts before a model's circuit opens
+    'breaker_reset_seconds': 30
+}
+
+# Live Game Refresher (answers "current score" queries from a polled feed; see live_games.py)
+LIVE_GAMES_CONFIG = {
+    'feed_url': os.getenv('NBA_LIVE_FEED_URL'),  # Refresher is off when unset
+    'game_ids': [g.strip() for g in os.getenv('NBA_LIVE_GAME_IDS', '').split(',') if g.strip()],
+    'poll_seconds': 15,
+    'max_age_seconds': 90,  # Staler than this, score queries go back to web search
+    'request_timeout_seconds': 5
+}
 
-# Cache Settings (for future optimization)
+# Local prediction engine (see prediction_engine.py); the prediction agent only explains its numbers
+PREDICTION_CONFIG = {
+    'window': 10,  # Recent games per player/team
+    'min_games': 3,
+    'ewm_span': 5,
+    'weights': {'ewm': 0.4, 'average': 0.3, 'trend': 0.3},
+    'min_trend_games': 5,  # Fewer games: the trend term falls back to the average
+    'opponent_shrinkage_games': 3,  # Head-to-head games needed for half weight
+    'interval_z': 1.0,  # +/- this many standard deviations (~68%)
+    'home_court_points': 2.5,
+    'margin_std': 12.0  # Spread of game margins, for win probability
+}
+
+# Batch API (/chat/batch)
+BATCH_CONFIG = {
+    'max_queries': 30,
+    'data_group_size': 5,  # Queries whose search results share one data-agent call
+    'max_output_tokens': 16000  # Merged call's cap: data_agent max_tokens per query, up to this
+}
+
+# Conversation History (per session)
+HISTORY_CONFIG = {
+    'max_turns': 20,           # Ring buffer length per session
+    'max_bytes': 64 * 1024,    # Serialized size budget per session
+    'max_age_hours': 6,
+    'max_sessions': 1000,      # Least recently used sessions are dropped beyond this
+    'spill_path': None         # SQLite file to keep evicted turns, e.g. './outputs/history.db'
+}
+
+# Local Stats Store (answers fully covered queries without web search)
+STATS_STORE_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(VIZ_CONFIG['output_dir'], 'stats.db'),
+    'current_season_max_age_hours': 12  # Current-season and career rows go stale
+}
+
+# Cache Settings
 CACHE_ENABLED = True
 CACHE_EXPIRY_HOURS = 24
+CACHE_LIVE_TTL_SECONDS = 120  # Time-relative queries ("who won tonight", "latest injury")
+CACHE_MAX_ENTRIES = 512  # Per pipeline stage (search, data, viz, chart, answer)
+CHART_MEMORY_ENTRIES = 256  # Rendered PNGs kept in memory; the rest live on disk
+CHART_DISK_MAX_FILES = 5000  # Oldest PNGs in outputs/charts are deleted beyond this
+CHART_DISK_MAX_AGE_HOURS = 7 * 24
+
+# Paraphrase matching for cache keys (see query_normalizer.QueryIndex)
+QUERY_MATCH_CONFIG = {
+    'enabled': True,
+    'similarity_threshold': 0.8,  # Trigram cosine between canonical queries asking about the same things
+    'max_entries': 5000
+}
+
+# Deployment (python serve.py). With more than one worker, response caches,
+# conversation history, the query index and live scores move to a SQLite file
+# every worker shares (see shared_state.py); otherwise they stay in-process.
+DEPLOYMENT_CONFIG = {
+    'host': os.getenv('NBA_HOST', '127.0.0.1'),
+    'port': int(os.getenv('NBA_PORT', '8000')),
+    'workers': int(os.getenv('NBA_WORKERS', '1')),
+    'shared_state': os.getenv('NBA_SHARED_STATE', '').lower() in ('1', 'true', 'yes'),  # Forced on for workers > 1
+    'shared_state_path': os.getenv('NBA_SHARED_STATE_PATH', os.path.join(VIZ_CONFIG['output_dir'], 'shared_state.db')),
+    'local_cache_entries': 128,  # Per-worker copies kept in front of the shared caches
+    'debug': os.getenv('NBA_DEBUG', '').lower() in ('1', 'true', 'yes')  # Flask debug server only
+}
 
 # Logging Configuration
 LOG_LEVEL = "INFO"
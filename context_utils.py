@@ -0,0 +1,110 @@
+import json
+import re
+
+from config import AGENT_CONFIG
+from record_utils import extract_rows
+
+try:  # Exact counts when tiktoken is available, ~4 chars/token otherwise
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+TRUNCATION_MARKER = "\n…[truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def context_budget(agent_key: str) -> int:
+    """Token budget for an agent's prompt context, from AGENT_CONFIG max_tokens."""
+    return AGENT_CONFIG[agent_key]["max_tokens"]
+
+
+def line_key(line: str) -> str:
+    """Comparison key for a line, ignoring case, bullets and spacing."""
+    return re.sub(r"[\s\-*•]+", " ", line).strip().lower()
+
+
+def dedupe_lines(text) -> str:
+    """Drop blank and repeated lines (ignoring case, bullets and spacing)."""
+    seen = set()
+    lines = []
+    for line in str(text or "").splitlines():
+        key = line_key(line)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        lines.append(line.rstrip())
+    return "\n".join(lines)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Keep whole lines from the top until ``budget`` tokens are used."""
+    if estimate_tokens(text) <= budget:
+        return text
+    kept, used = [], estimate_tokens(TRUNCATION_MARKER)
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept) + TRUNCATION_MARKER
+
+
+def compact_structured_data(structured_data) -> str:
+    """Minified JSON rows when the data parses as rows, else deduped text.
+
+    Every field is kept (dates, opponents, results, notes); only empty values
+    and repeated rows are dropped.
+    """
+    rows = extract_rows(structured_data)
+    if rows:
+        seen, compact = set(), []
+        for row in rows:
+            row = {k: v for k, v in row.items() if v not in (None, "", [], {})}
+            key = json.dumps(row, sort_keys=True, default=str)
+            if row and key not in seen:
+                seen.add(key)
+                compact.append(row)
+        return json.dumps(compact, separators=(",", ":"), default=str)
+    return dedupe_lines(structured_data)
+
+
+def summarize_viz(viz_json) -> str:
+    """What the orchestrator needs to mention a chart; the numbers are in the data."""
+    if not isinstance(viz_json, dict):
+        return "None"
+    data = viz_json.get("data") if isinstance(viz_json.get("data"), dict) else viz_json
+    series = [ds.get("label") for ds in viz_json.get("datasets", []) if isinstance(ds, dict)]
+    series = series or [k for k, v in data.items() if k != "labels" and isinstance(v, list)]
+    return json.dumps(
+        {
+            "title": viz_json.get("title"),
+            "type": viz_json.get("type") or viz_json.get("visualization_type"),
+            "labels": data.get("labels", []),
+            "series": series,
+        },
+        separators=(",", ":"),
+    )
+
+
+def compact_sections(sections, budget: int):
+    """Fit ``[(name, text), ...]`` into ``budget`` tokens, in priority order.
+
+    Earlier sections are kept whole when possible; later ones get what is left.
+    """
+    compacted = {}
+    remaining = budget
+    for name, text in sections:
+        text = truncate_to_tokens(text, max(remaining, 0))
+        compacted[name] = text
+        remaining -= estimate_tokens(text)
+    return compacted
@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_SESSION = "default"
+SWEEP_EVERY = 100  # Appends between sweeps of expired spilled turns
+
+
+def _entry_size(entry) -> int:
+    return len(json.dumps(entry, default=str).encode("utf-8"))
+
+
+class ConversationHistory:
+    """Per-session conversation history bounded by turns, bytes and age.
+
+    Each session is a ring buffer; the least recently used sessions are dropped
+    once ``max_sessions`` is reached. With ``spill_path`` set, evicted turns are
+    moved to SQLite instead of being discarded and are still returned by get().
+    """
+
+    def __init__(
+        self,
+        max_turns=20,
+        max_bytes=64 * 1024,
+        max_age_hours=6,
+        max_sessions=1000,
+        spill_path=None,
+    ):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_hours * 3600
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> deque[(size, entry)]
+        self._session_bytes = {}
+        self._appends = 0
+        self._lock = threading.Lock()
+
+        self._db = None
+        if spill_path:
+            if spill_path != ":memory:" and os.path.dirname(spill_path):
+                os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "session_id TEXT NOT NULL, ts REAL NOT NULL, entry TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_history_session ON history (session_id, ts)"
+            )
+            self._db.commit()
+
+    def append(self, session_id, entry):
+        entry = dict(entry, timestamp=entry.get("timestamp", time.time()))
+        size = _entry_size(entry)
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            self._expire_idle(cutoff)
+            turns = self._sessions.get(session_id)
+            while turns and turns[0][1]["timestamp"] < cutoff:
+                self._pop_oldest(session_id)
+            if turns is None:
+                turns = self._sessions[session_id] = deque()
+                self._session_bytes[session_id] = 0
+            self._sessions.move_to_end(session_id)
+            turns.append((size, entry))
+            self._session_bytes[session_id] += size
+
+            evicted = []
+            while turns and (
+                len(turns) > self.max_turns
+                or self._session_bytes[session_id] > self.max_bytes
+            ):
+                evicted.append(self._pop_oldest(session_id))
+            while len(self._sessions) > self.max_sessions:
+                old_id, old_turns = self._sessions.popitem(last=False)
+                self._session_bytes.pop(old_id, None)
+                evicted.extend((old_id, e) for _, e in old_turns)
+            self._spill(evicted)
+            self._appends += 1
+            if self._db is not None and self._appends % SWEEP_EVERY == 0:
+                self._db.execute("DELETE FROM history WHERE ts < ?", (cutoff,))
+                self._db.commit()
+
+    def get(self, session_id, limit=None):
+        """Oldest-first turns for a session that are younger than max_age."""
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            self._expire(session_id, cutoff)
+            entries = [e for _, e in self._sessions.get(session_id, ())]
+            if self._db is not None:
+                rows = self._db.execute(
+                    "SELECT entry FROM history WHERE session_id = ? AND ts >= ? ORDER BY ts",
+                    (session_id, cutoff),
+                ).fetchall()
+                entries = [json.loads(row[0]) for row in rows] + entries
+        return entries[-limit:] if limit else entries
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._session_bytes.pop(session_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+                self._db.commit()
+
+    def memory_bytes(self) -> int:
+        """Approximate serialized size of all in-memory turns."""
+        return sum(self._session_bytes.values())
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "turns": sum(len(t) for t in self._sessions.values()),
+            "memory_bytes": self.memory_bytes(),
+            "spill_enabled": self._db is not None,
+        }
+
+    def _expire_idle(self, cutoff):
+        """Drop sessions whose newest turn is older than ``cutoff``.
+
+        Sessions are kept in least-recently-appended order, so the sweep stops
+        at the first session that is still active.
+        """
+        while self._sessions:
+            session_id, turns = next(iter(self._sessions.items()))
+            if turns and turns[-1][1]["timestamp"] >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self._session_bytes.pop(session_id, None)
+
+    def _pop_oldest(self, session_id):
+        size, entry = self._sessions[session_id].popleft()
+        self._session_bytes[session_id] -= size
+        return session_id, entry
+
+    def _expire(self, session_id, cutoff):
+        turns = self._sessions.get(session_id)
+        while turns and turns[0][1]["timestamp"] < cutoff:
+            self._pop_oldest(session_id)
+        if self._db is not None:
+            self._db.execute(
+                "DELETE FROM history WHERE session_id = ? AND ts < ?", (session_id, cutoff)
+            )
+            self._db.commit()
+
+    def _spill(self, evicted):
+        if self._db is None or not evicted:
+            return
+        self._db.executemany(
+            "INSERT INTO history (session_id, ts, entry) VALUES (?, ?, ?)",
+            [
+                (sid, entry["timestamp"], json.dumps(entry, default=str))
+                for sid, entry in evicted
+            ],
+        )
+        self._db.commit()
+
+
+class SharedConversationHistory:
+    """ConversationHistory interface over a SharedKV's SQLite file.
+
+    Used when several worker processes serve the same sessions: any worker
+    sees turns appended by the others. Bounded by the same turns, bytes and
+    age limits; sessions are dropped once all their turns have aged out.
+    """
+
+    def __init__(self, kv, max_turns=20, max_bytes=64 * 1024, max_age_hours=6, **_unused):
+        self.kv = kv
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_hours * 3600
+        db = kv.connection()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS session_history ("
+            "session_id TEXT NOT NULL, ts REAL NOT NULL, size INTEGER NOT NULL, entry TEXT NOT NULL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_history ON session_history (session_id, ts)"
+        )
+
+    def append(self, session_id, entry):
+        entry = dict(entry, timestamp=entry.get("timestamp", time.time()))
+        payload = json.dumps(entry, default=str)
+        db = self.kv.connection()
+        with db:  # One transaction, so concurrent appends trim consistently
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "INSERT INTO session_history (session_id, ts, size, entry) VALUES (?, ?, ?, ?)",
+                (session_id, entry["timestamp"], len(payload.encode("utf-8")), payload),
+            )
+            # Newest first: keep max_turns rows whose running size fits max_bytes
+            db.execute(
+                "DELETE FROM session_history WHERE rowid IN ("
+                "SELECT rowid FROM (SELECT rowid, "
+                "ROW_NUMBER() OVER (ORDER BY ts DESC, rowid DESC) AS n, "
+                "SUM(size) OVER (ORDER BY ts DESC, rowid DESC) AS running "
+                "FROM session_history WHERE session_id = ?) WHERE n > ? OR running > ?)",
+                (session_id, self.max_turns, self.max_bytes),
+            )
+            db.execute(
+                "DELETE FROM session_history WHERE ts < ?", (time.time() - self.max_age_seconds,)
+            )
+
+    def get(self, session_id, limit=None):
+        """Oldest-first turns for a session that are younger than max_age."""
+        rows = self.kv.connection().execute(
+            "SELECT entry FROM session_history WHERE session_id = ? AND ts >= ? ORDER BY ts, rowid",
+            (session_id, time.time() - self.max_age_seconds),
+        ).fetchall()
+        entries = [json.loads(row[0]) for row in rows]
+        return entries[-limit:] if limit else entries
+
+    def clear(self, session_id):
+        self.kv.connection().execute(
+            "DELETE FROM session_history WHERE session_id = ?", (session_id,)
+        )
+
+    def memory_bytes(self) -> int:
+        return 0  # Turns live in SQLite, not in this process
+
+    def stats(self) -> dict:
+        sessions, turns, size = self.kv.connection().execute(
+            "SELECT COUNT(DISTINCT session_id), COUNT(*), COALESCE(SUM(size), 0) FROM session_history"
+        ).fetchone()
+        return {
+            "sessions": sessions,
+            "turns": turns,
+            "stored_bytes": size,
+            "memory_bytes": 0,
+            "backend": "sqlite",
+        }
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import re
+import threading
+import time
+
+import requests
+
+from cache_utils import normalize_query
+
+# Query words asking about games in progress, answered from the index
+# (whole words: "scorer" or "winning percentage" are not score questions)
+SCORE_KEYWORDS = (
+    "score", "scores", "tonight", "live", "right now", "halftime", "quarter", "who won",
+    "who is winning", "who s winning", "who is leading", "who s leading",
+)
+SCORE_RE = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in SCORE_KEYWORDS) + r")\b")
+# Without a team name, these ask about every tracked game
+ALL_GAMES_WORDS = ("games", "scores", "scoreboard")
+# Questions about a season, a career or history are never about tonight's game
+HISTORY_RE = re.compile(r"\b(?:(?:19|20)\d{2}|season|career|all.?time|ever|history|record)\b")
+# Team abbreviations count only when typed in capitals: "was", "min" and "den" are also words
+ABBR_RE = re.compile(r"\b[A-Z]{2,4}\b")
+
+
+class HttpFeedFetcher:
+    """Polls a JSON scores feed: ``GET {feed_url}/games?ids=..&since=..``.
+
+    The feed returns ``{"games": [...]}`` with every game changed since
+    ``since`` (all of them when it is 0). Each game is a dict with at least
+    ``game_id``; other fields may be partial updates. A local fixture server
+    implementing this one endpoint can stand in for a real provider.
+    """
+
+    def __init__(self, feed_url, timeout_seconds=5):
+        self.feed_url = feed_url.rstrip("/")
+        self.timeout_seconds = timeout_seconds
+        self.session = requests.Session()
+
+    def __call__(self, game_ids, since):
+        response = self.session.get(
+            f"{self.feed_url}/games",
+            params={"ids": ",".join(game_ids), "since": since},
+            timeout=self.timeout_seconds,
+        )
+        response.raise_for_status()
+        return response.json().get("games", [])
+
+
+def _merge(current, update) -> bool:
+    """Apply ``update`` onto ``current`` in place (nested dicts merged); True if anything changed."""
+    changed = False
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(current.get(key), dict):
+            changed = _merge(current[key], value) or changed
+        elif current.get(key) != value:
+            current[key] = value
+            changed = True
+    return changed
+
+
+def _team_keys(name):
+    """Names a query may use for a team: full name and nickname."""
+    full = normalize_query(name or "")
+    return {full, full.split()[-1]} if full else set()
+
+
+def format_game(game) -> str:
+    """'Lakers 98, Celtics 95 (Q4 2:31)' plus top scorers when a box score is present."""
+    line = f"{game.get('away', 'Away')} {game.get('away_score', 0)}, {game.get('home', 'Home')} {game.get('home_score', 0)}"
+    status = game.get("status") or ""
+    if status.lower() != "final" and game.get("period"):
+        status = f"Q{game['period']} {game.get('clock', '')}".strip()
+    if status:
+        line += f" ({status})"
+
+    players = (game.get("box") or {}).get("players") or {}
+    scorers = sorted(
+        ((name, p.get("pts", 0)) for name, p in players.items() if isinstance(p, dict)),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:3]
+    if scorers:
+        line += " — top scorers: " + ", ".join(f"{name} {pts}" for name, pts in scorers)
+    return line
+
+
+class LiveGameIndex:
+    """In-memory game state, updated incrementally by the refresher.
+
+    lookup() answers score-style queries only while the feed is fresh, i.e.
+    the last successful poll was at most ``max_age_seconds`` ago.
+    """
+
+    def __init__(self, max_age_seconds=90):
+        self.max_age_seconds = max_age_seconds
+        self.refreshed_at = None
+        self._games = {}
+        self._team_index = {}
+        self._abbr_index = {}
+        self._updates = 0
+        self._lock = threading.Lock()
+
+    def apply(self, updates) -> int:
+        """Merge fetched game updates; returns how many games changed."""
+        changed = 0
+        with self._lock:
+            for update in updates:
+                game_id = str(update.get("game_id", ""))
+                if not game_id:
+                    continue
+                game = self._games.setdefault(game_id, {"game_id": game_id})
+                if _merge(game, update):
+                    changed += 1
+                    game["changed_at"] = time.time()
+                    for key in _team_keys(game.get("home")) | _team_keys(game.get("away")):
+                        self._team_index[key] = game_id
+                    for abbr in (game.get("home_abbr"), game.get("away_abbr")):
+                        if abbr:
+                            self._abbr_index[abbr.upper()] = game_id
+            self._updates += changed
+            self.refreshed_at = time.time()
+        return changed
+
+    def is_fresh(self) -> bool:
+        return self.refreshed_at is not None and time.time() - self.refreshed_at <= self.max_age_seconds
+
+    def lookup(self, query):
+        """Tracked games a live-score query is about, or None."""
+        q = normalize_query(query)
+        if not self._games or not SCORE_RE.search(q) or not self.is_fresh():
+            return None
+        if HISTORY_RE.search(q):
+            return None  # "who won in 2016" is history, not a live game
+
+        words = set(q.split())
+        abbrs = set(ABBR_RE.findall(query))
+        with self._lock:
+            ids = {gid for key, gid in self._team_index.items() if key in words or (" " in key and key in q)}
+            ids |= {gid for abbr, gid in self._abbr_index.items() if abbr in abbrs}
+            if not ids and words & set(ALL_GAMES_WORDS):
+                ids = set(self._games)
+            return [dict(self._games[gid]) for gid in sorted(ids)] or None
+
+    def snapshot(self) -> dict:
+        """Games plus refresh time, for publishing to other worker processes."""
+        with self._lock:
+            return {"refreshed_at": self.refreshed_at, "games": list(self._games.values())}
+
+    def load(self, snapshot):
+        """Adopt a snapshot published by the polling worker, keeping its freshness."""
+        if not snapshot:
+            return
+        self.apply(snapshot["games"])
+        with self._lock:
+            self.refreshed_at = snapshot["refreshed_at"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            age = round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None
+            return {"games": len(self._games), "updates": self._updates, "seconds_since_refresh": age}
+
+
+class LiveGameRefresher:
+    """Background task polling ``fetcher(game_ids, since)`` into a LiveGameIndex.
+
+    One poll per interval covers every tracked game, so the cost is fixed per
+    game rather than a web search per user asking for the score.
+
+    With ``shared`` (a shared_state.SharedKV), only the worker holding the
+    "live_games" lease polls the feed and publishes the index; the other
+    workers load that snapshot each interval instead of polling themselves.
+    """
+
+    def __init__(self, index, fetcher, game_ids, poll_seconds=15, shared=None):
+        self.index = index
+        self.fetcher = fetcher
+        self.game_ids = [str(g) for g in game_ids]
+        self.poll_seconds = poll_seconds
+        self.shared = shared
+        self._owner = f"{os.getpid()}-{id(self)}"
+        self._since = 0
+        self._task = None
+
+    async def poll_once(self) -> int:
+        polled_at = time.time()
+        updates = await asyncio.to_thread(self.fetcher, self.game_ids, self._since)
+        changed = self.index.apply(updates)
+        self._since = polled_at
+        return changed
+
+    async def refresh(self) -> int:
+        """Poll the feed, or load the published index when another worker polls."""
+        if self.shared is None:
+            return await self.poll_once()
+        leader = await asyncio.to_thread(
+            self.shared.acquire_lease, "live_games", self._owner, self.poll_seconds * 3
+        )
+        if not leader:
+            self._since = 0  # Poll everything should this worker take over
+            snapshot = await asyncio.to_thread(self.shared.get, "live_games", "index")
+            self.index.load(snapshot)
+            return 0
+        changed = await self.poll_once()
+        await asyncio.to_thread(self.shared.set, "live_games", "index", self.index.snapshot())
+        return changed
+
+    async def run(self):
+        print(f"🔴 Live game refresher tracking {len(self.game_ids)} games every {self.poll_seconds}s")
+        while True:
+            try:
+                changed = await self.refresh()
+                if changed:
+                    print(f"🔴 Live games: {changed} updated")
+            except Exception as e:
+                # Keep polling; the index goes stale and lookups fall back to search
+                print(f"⚠️ Live game refresh failed: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self, loop=None):
+        """Start polling on ``loop`` (from any thread) or on the running loop."""
+        if self._task is not None:
+            return
+        if loop is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        else:
+            self._task = asyncio.run_coroutine_threadsafe(self.run(), loop)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
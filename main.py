@@ -1,15 +1,62 @@
 from nba_agents.search_agent import search_agent
 from nba_agents.data_agent import data_agent
 from nba_agents.visualization_agent import visualization_agent
-from nba_agents.orchestrator_agent import orchestrator_agent
+from nba_agents.predict_agent import prediction_agent
+from nba_agents.router import route_orchestrator
 from agents import Runner
+from openai.types.responses import ResponseTextDeltaEvent
 import asyncio
+import dataclasses
+import os
+import threading
+import weakref
 from dotenv import load_dotenv
 import json
 import re
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from vizualization_utils import generate_chart_from_json
+from collections import Counter
+from chart_store import ChartStore, chart_url
+from vizualization_utils import compile_chart_spec, chart_spec_stats, chart_spec_hash
+from render_service import render_service
+from metrics import metrics, configure_logging
+from upstream import upstream, is_upstream_failure
+from context_utils import (
+    compact_sections,
+    compact_structured_data,
+    context_budget,
+    dedupe_lines,
+    line_key,
+    summarize_viz,
+    truncate_to_tokens,
+)
+from history_store import ConversationHistory, SharedConversationHistory, DEFAULT_SESSION
+from shared_state import SharedKV, SharedTTLCache
+from stats_store import StatsStore
+from query_normalizer import QueryIndex, canonicalize_query, parse_query
+from prediction_engine import (
+    GAME_LOG_DATA_HINT,
+    GAME_LOG_SEARCH_HINT,
+    format_predictions,
+    is_prediction_query,
+    predict,
+    prediction_chart_spec,
+)
+from live_games import HttpFeedFetcher, LiveGameIndex, LiveGameRefresher, format_game
+from config import (
+    MAX_CONCURRENT_QUERIES,
+    WAIT_FOR_VIZ_CONTEXT,
+    CACHE_ENABLED,
+    CACHE_EXPIRY_HOURS,
+    CACHE_LIVE_TTL_SECONDS,
+    CACHE_MAX_ENTRIES,
+    HISTORY_CONFIG,
+    STATS_STORE_CONFIG,
+    BATCH_CONFIG,
+    AGENT_CONFIG,
+    LIVE_GAMES_CONFIG,
+    QUERY_MATCH_CONFIG,
+    DEPLOYMENT_CONFIG,
+)
+from cache_utils import TTLCache, SingleFlight, is_time_sensitive, normalize_query
 
 # Load environment variables
 load_dotenv(override=True)
@@ -18,118 +65,841 @@ load_dotenv(override=True)
 #   NBA STATS CHATBOT CLASS
 # ------------------------------------
 class NBAStatsChatbot:
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_QUERIES,
+        wait_for_viz_context: bool = WAIT_FOR_VIZ_CONTEXT,
+        live_fetcher=None,
+    ):
         self.search_agent = search_agent
         self.data_agent = data_agent
         self.viz_agent = visualization_agent
-        self.orchestrator = orchestrator_agent
-        self.conversation_history = []
+        self.prediction_agent = prediction_agent  # Explains prediction_engine output
+        self.route_orchestrator = route_orchestrator  # query -> orchestrator agent
 
-        # ✅ Use a single event loop that stays open
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
+        # Multi-worker deployments share caches, history, the query index and
+        # live scores through one SQLite file; single-process runs keep them in memory
+        self.shared_state = None
+        if DEPLOYMENT_CONFIG["shared_state"] or DEPLOYMENT_CONFIG["workers"] > 1:
+            self.shared_state = SharedKV(DEPLOYMENT_CONFIG["shared_state_path"])
 
-    async def _run_agent(self, agent, prompt):
+        # Bounded per-session history; charts are kept as URLs, not image data
+        if self.shared_state is not None:
+            self.conversation_history = SharedConversationHistory(self.shared_state, **HISTORY_CONFIG)
+        else:
+            self.conversation_history = ConversationHistory(**HISTORY_CONFIG)
+        self.max_concurrency = max_concurrency
+        self.wait_for_viz_context = wait_for_viz_context
+
+        # Charts render in warm worker processes, off the event loop and the GIL
+        self.render_service = render_service
+        self.upstream = upstream
+
+        # Rendered PNGs are content-addressed and served from /charts/<id>.png
+        self.chart_store = ChartStore(save_to_disk=True if self.shared_state is not None else None)
+
+        # Previously extracted stats; fully covered queries skip search + data agents
+        self.stats_store = None
+        if STATS_STORE_CONFIG["enabled"]:
+            self.stats_store = StatsStore(
+                STATS_STORE_CONFIG["path"], STATS_STORE_CONFIG["current_season_max_age_hours"]
+            )
+
+        # Live scores polled in the background; score queries skip every agent.
+        # ``live_fetcher(game_ids, since)`` can replace the HTTP feed (e.g. a fixture)
+        self.live_games = LiveGameIndex(LIVE_GAMES_CONFIG["max_age_seconds"])
+        if live_fetcher is None and LIVE_GAMES_CONFIG["feed_url"]:
+            live_fetcher = HttpFeedFetcher(
+                LIVE_GAMES_CONFIG["feed_url"], LIVE_GAMES_CONFIG["request_timeout_seconds"]
+            )
+        self.live_refresher = None
+        if live_fetcher is not None and LIVE_GAMES_CONFIG["game_ids"]:
+            self.live_refresher = LiveGameRefresher(
+                self.live_games,
+                live_fetcher,
+                LIVE_GAMES_CONFIG["game_ids"],
+                LIVE_GAMES_CONFIG["poll_seconds"],
+                shared=self.shared_state,
+            )
+
+        # Paraphrases ("Steph 3s this year" / "Curry three pointers 2026-27") share cache keys
+        self.query_index = None
+        if QUERY_MATCH_CONFIG["enabled"]:
+            self.query_index = QueryIndex(
+                QUERY_MATCH_CONFIG["similarity_threshold"],
+                QUERY_MATCH_CONFIG["max_entries"],
+                shared=self.shared_state,
+                shared_ttl_seconds=CACHE_EXPIRY_HOURS * 3600,
+            )
+
+        self._merged_data_agents = {}  # group size -> data_agent clone (see _merged_data_agent)
+
+        # Identical in-flight queries share one pipeline execution (per worker)
+        self._singleflight = SingleFlight()
+
+        # Per-stage response caches keyed on the normalized query
+        self.caches = {}
+        if CACHE_ENABLED:
+            self.caches = {
+                stage: self._make_cache(stage) for stage in ("search", "data", "viz", "chart", "answer")
+            }
+
+        # One semaphore per event loop: asyncio primitives can't be shared across loops
+        self._semaphores = weakref.WeakKeyDictionary()
+
+        # Background loop for sync callers (Flask), started on first use
+        self.loop = None
+        self._loop_lock = threading.Lock()
+
+    def _make_cache(self, stage):
+        if self.shared_state is None:
+            return TTLCache(CACHE_MAX_ENTRIES, CACHE_EXPIRY_HOURS * 3600)
+        return SharedTTLCache(
+            self.shared_state,
+            f"cache.{stage}",
+            CACHE_MAX_ENTRIES,
+            CACHE_EXPIRY_HOURS * 3600,
+            DEPLOYMENT_CONFIG["local_cache_entries"],
+        )
+
+    def _ensure_loop(self):
+        """Start the background event loop used by the sync process_query()."""
+        with self._loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self.loop.run_forever, name="nba-chatbot-loop", daemon=True
+                ).start()
+        return self.loop
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Concurrency limiter bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _offload(self, func, *args):
+        """Call ``func``, in a worker thread when it may block on the shared SQLite file."""
+        if self.shared_state is None:
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    async def _cache_key(self, user_query):
+        """Cache/single-flight key: canonical query, or an earlier paraphrase's key.
+
+        Time-relative queries keep their raw wording (so "tonight" stays in the
+        key and _cache_set() can give them a short TTL) and skip the index.
+        """
+        if self.query_index is None or is_time_sensitive(user_query):
+            return normalize_query(user_query)
+        return await self._offload(self.query_index.cache_key, user_query)
+
+    async def _cache_get(self, stage, key):
+        cache = self.caches.get(stage)
+        return await self._offload(cache.get, key) if cache is not None else None
+
+    async def _cache_set(self, stage, key, value):
+        cache = self.caches.get(stage)
+        if cache is not None and value is not None:
+            # "Lakers score today" must not be replayed tomorrow
+            ttl = CACHE_LIVE_TTL_SECONDS if is_time_sensitive(key) else None
+            await self._offload(cache.set, key, value, ttl)
+
+    def cache_stats(self) -> dict:
+        return {stage: cache.stats() for stage, cache in self.caches.items()}
+
+    async def _run_agent(self, agent, prompt, stage):
         """Run any agent asynchronously and return structured output."""
-        result = await Runner.run(agent, prompt)
+        with metrics.span(f"agent.{stage}", model=str(agent.model)):
+            result = await self.upstream.call(
+                str(agent.model), stage, lambda: Runner.run(agent, prompt)
+            )
+        usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+        metrics.record_usage(stage, agent.model, usage)
         return getattr(result, "final_output", result)
 
-    def process_query(self, user_query: str) -> dict:
-        """Pipeline: Search → Data → (Viz) → Orchestrator."""
+    def metrics_snapshot(self) -> dict:
+        """Everything /metrics reports: stage latency/tokens plus cache and store stats."""
+        snapshot = metrics.snapshot()
+        snapshot["caches"] = self.cache_stats()
+        snapshot["singleflight"] = self._singleflight.stats()
+        snapshot["worker"] = {"pid": os.getpid(), "shared_state": self.shared_state is not None}
+        snapshot["chart_spec"] = chart_spec_stats()
+        snapshot["history"] = self.conversation_history.stats()
+        snapshot["upstream"] = self.upstream.stats()
+        snapshot["live_games"] = self.live_games.stats()
+        if self.query_index is not None:
+            snapshot["query_index"] = self.query_index.stats()
+        if self.stats_store is not None:
+            snapshot["stats_store"] = self.stats_store.stats()
+        return snapshot
+
+    def process_query(self, user_query: str, session_id: str = DEFAULT_SESSION) -> dict:
+        """Blocking wrapper around aprocess_query() for sync callers like Flask."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.aprocess_query(user_query, session_id), self._ensure_loop()
+        )
+        return future.result()
+
+    async def aprocess_query(self, user_query: str, session_id: str = DEFAULT_SESSION) -> dict:
+        """Pipeline: Search → Data → (Viz) → Orchestrator, on the caller's event loop.
+
+        Concurrent equivalent queries (same cache key) share one pipeline run.
+        """
+        cache_key = await self._cache_key(user_query)
+        result = await self._singleflight.do(
+            cache_key, lambda: self._limited_pipeline(user_query, cache_key)
+        )
+        result = dict(result)
+        if "error" not in result:
+            await self._record_history(session_id, user_query, result)
+        return result
+
+    async def _limited_pipeline(self, user_query: str, cache_key: str) -> dict:
+        async with self._get_semaphore():
+            with metrics.span("pipeline"):
+                return await self._run_pipeline(user_query, cache_key)
+
+    async def _run_pipeline(self, user_query: str, cache_key: str) -> dict:
         try:
-            print("1️⃣ Running Search Agent...")
-            search_response = self.loop.run_until_complete(
-                self._run_agent(self.search_agent, user_query)
-            )
-            search_results = getattr(search_response, "data", str(search_response))
+            live = self._live_answer(user_query)
+            if live is not None:
+                return live
+
+            local = self._local_lookup(user_query)
+            if local is not None:
+                search_results, structured_data = local
+            else:
+                try:
+                    search_results = await self._search_stage(user_query, cache_key)
+                    structured_data = await self._data_stage(
+                        search_results, cache_key, game_logs=is_prediction_query(user_query)
+                    )
+                except Exception as e:
+                    # Model API down or rate limited: answer from stale stored stats if any
+                    local = self._local_lookup(user_query, allow_stale=True) if is_upstream_failure(e) else None
+                    if local is None:
+                        raise
+                    self.upstream.note_degraded()
+                    search_results, structured_data = local
+            return await self._answer_stages(user_query, cache_key, search_results, structured_data)
+
+        except Exception as e:
+            print(f"❌ Error in process_query: {e}")
+            return self._error_result(e)
 
-            print("2️⃣ Running Data Agent...")
-            data_prompt = f"Extract structured NBA data from these search results:\n\n{search_results}"
-            data_response = self.loop.run_until_complete(
-                self._run_agent(self.data_agent, data_prompt)
+    async def _answer_stages(self, user_query, cache_key, search_results, structured_data):
+        """Viz (if needed) and orchestrator stages on already gathered data."""
+        if is_prediction_query(user_query):
+            result = await self._prediction_stage(user_query, cache_key, search_results, structured_data)
+            if result is not None:
+                return result
+            print("⚠️ No usable game logs for a prediction, falling back to the orchestrator")
+
+        print("3️⃣ Checking if visualization is needed...")
+        needs_viz = self._needs_visualization(user_query)
+        viz_json = None
+        chart_id = None
+
+        if needs_viz and self.wait_for_viz_context:
+            # Orchestrator sees the viz JSON; only the chart render overlaps it
+            viz_json = await self._viz_stage(user_query, structured_data, cache_key)
+            chart_task = asyncio.create_task(self._render_chart(viz_json, cache_key))
+            final_answer = await self._orchestrator_stage(
+                user_query, search_results, structured_data, viz_json, cache_key
+            )
+            chart_id = await chart_task
+        elif needs_viz:
+            # Viz agent + chart render run alongside the orchestrator
+            (viz_json, chart_id), final_answer = await asyncio.gather(
+                self._viz_and_chart_stage(user_query, structured_data, cache_key),
+                self._orchestrator_stage(
+                    user_query, search_results, structured_data, None, cache_key
+                ),
+            )
+        else:
+            final_answer = await self._orchestrator_stage(
+                user_query, search_results, structured_data, None, cache_key
             )
-            structured_data = getattr(data_response, "data", str(data_response))
-
-            print("3️⃣ Checking if visualization is needed...")
-            needs_viz = self._needs_visualization(user_query)
-            viz_json = None
-            chart_base64 = None
-
-            if needs_viz:
-                print("📊 Visualization requested...")
-                viz_prompt = (
-                    f"Generate a visualization for: '{user_query}'.\n"
-                    f"Use this structured data:\n{structured_data}\n\n"
-                    f"Return JSON with 'title', 'type', 'labels', and 'datasets'."
-                )
-                viz_response = self.loop.run_until_complete(
-                    self._run_agent(self.viz_agent, viz_prompt)
-                )
-                viz_json_raw = getattr(viz_response, "data", str(viz_response))
-                viz_json = self._safe_json_parse(viz_json_raw)
-
-                if isinstance(viz_json, dict):
-                    if "data" in viz_json and "labels" in viz_json["data"]:
-                        viz_json_fixed = {
-                            "title": viz_json.get("title", "NBA Visualization"),
-                            "labels": viz_json["data"].get("labels", []),
-                            "datasets": [
-                                {"label": k, "data": v}
-                                for k, v in viz_json["data"].items()
-                                if k != "labels"
-                            ],
-                        }
-                    else:
-                        viz_json_fixed = viz_json
 
-                    try:
-                        chart_base64 = generate_chart_from_json(viz_json_fixed)
-                    except Exception as chart_err:
-                        print(f"⚠️ Chart generation failed: {chart_err}")
-                        chart_base64 = None
-                else:
-                    print("⚠️ Invalid visualization JSON received, skipping chart.")
+        return self._build_result(
+            search_results, structured_data, viz_json, chart_id, final_answer
+        )
 
-            print("4️⃣ Running Orchestrator Agent...")
-            final_prompt = (
+    async def _prediction_stage(self, user_query, cache_key, search_results, structured_data):
+        """Forecast from game logs with the local engine; the prediction agent explains it.
+
+        None when the data has no usable game logs.
+        """
+        print("🔮 Running local prediction engine...")
+        with metrics.span("prediction.compute"):
+            predictions = await asyncio.to_thread(predict, structured_data, user_query)
+        if predictions is None:
+            return None
+
+        spec = prediction_chart_spec(predictions)
+        chart_task = asyncio.create_task(self._render_chart(spec, cache_key))
+
+        final_answer = await self._cache_get("answer", cache_key)
+        if final_answer is None:
+            prompt = (
                 f"User query: {user_query}\n\n"
-                f"Search results: {search_results}\n\n"
-                f"Structured data: {structured_data}\n\n"
-                f"Visualization JSON: {json.dumps(viz_json, indent=2) if viz_json else 'None'}\n\n"
-                f"Provide a concise, factual, conversational summary for the user."
-            )
-            final_response = self.loop.run_until_complete(
-                self._run_agent(self.orchestrator, final_prompt)
+                f"Predictions computed by the local model (JSON):\n"
+                f"{json.dumps(predictions, separators=(',', ':'))}\n\n"
+                f"Explain these predictions to the user. Use the numbers exactly as given."
             )
-            final_answer = getattr(final_response, "data", str(final_response))
+            try:
+                response = await self._run_agent(self.prediction_agent, prompt, "prediction")
+                final_answer = getattr(response, "data", str(response))
+                await self._cache_set("answer", cache_key, final_answer)
+            except Exception as e:
+                if not is_upstream_failure(e):
+                    raise
+                final_answer = self._fallback_answer(format_predictions(predictions), e)
 
-            chart_title = viz_json.get("title") if isinstance(viz_json, dict) else ""
-            self.conversation_history.append(
-                {
-                    "query": user_query,
-                    "answer": final_answer,
-                    "data": structured_data,
-                    "visualization": chart_base64,
-                    "visualization_title": chart_title,
-                }
+        result = self._build_result(search_results, structured_data, spec, await chart_task, final_answer)
+        result["predictions"] = predictions
+        return result
+
+    def _error_result(self, error):
+        return {
+            "answer": f"An error occurred: {error}",
+            "structured_data": None,
+            "visualization": None,
+            "search_results": None,
+            "error": str(error),
+        }
+
+    def process_batch(self, queries, session_id: str = DEFAULT_SESSION) -> list:
+        """Blocking wrapper around abatch_process() for sync callers like Flask."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.abatch_process(queries, session_id), self._ensure_loop()
+        )
+        return future.result()
+
+    async def abatch_process(self, queries, session_id: str = DEFAULT_SESSION) -> list:
+        """Answer several queries in one go; returns one result per query, in order.
+
+        Duplicate queries (same cache key, so paraphrases too) run once, searches run
+        concurrently, and the search results of up to
+        BATCH_CONFIG['data_group_size'] queries share one data-agent call.
+        """
+        keys = await asyncio.gather(*(self._cache_key(query) for query in queries))
+        unique = {}
+        for key, query in zip(keys, queries):
+            unique.setdefault(key, query)
+        semaphore = self._get_semaphore()
+
+        async def limited(coro):
+            async with semaphore:
+                return await coro
+
+        # 1. Live scores and the local stats store, then concurrent web searches for the rest
+        live = {}
+        gathered = {}
+        to_search = []
+        for key, query in unique.items():
+            live_result = self._live_answer(query)
+            if live_result is not None:
+                live[key] = live_result
+                continue
+            local = self._local_lookup(query)
+            if local is not None:
+                gathered[key] = local
+            else:
+                to_search.append(key)
+        searches = await asyncio.gather(
+            *(limited(self._search_stage(unique[key], key)) for key in to_search),
+            return_exceptions=True,
+        )
+
+        # 2. Structured data: cached, else merged data-agent calls per group
+        need_data = []
+        for key, search_results in zip(to_search, searches):
+            if isinstance(search_results, Exception):
+                gathered[key] = search_results
+                continue
+            cached = await self._cache_get("data", key)
+            if cached is not None:
+                gathered[key] = (search_results, cached)
+            else:
+                need_data.append((key, search_results, is_prediction_query(unique[key])))
+
+        group_size = BATCH_CONFIG["data_group_size"]
+        groups = [need_data[i:i + group_size] for i in range(0, len(need_data), group_size)]
+        merged = await asyncio.gather(
+            *(limited(self._merged_data_stage(group)) for group in groups),
+            return_exceptions=True,
+        )
+        missing = []
+        for group, extracted in zip(groups, merged):
+            for key, search_results, game_logs in group:
+                if isinstance(extracted, dict) and key in extracted:
+                    gathered[key] = (search_results, extracted[key])
+                else:
+                    missing.append((key, search_results, game_logs))
+        if missing:
+            print(f"⚠️ Merged extraction missed {len(missing)} queries, extracting individually")
+            fallbacks = await asyncio.gather(
+                *(limited(self._data_stage(sr, key, game_logs=gl)) for key, sr, gl in missing),
+                return_exceptions=True,
             )
+            for (key, search_results, _), structured_data in zip(missing, fallbacks):
+                gathered[key] = (
+                    structured_data if isinstance(structured_data, Exception)
+                    else (search_results, structured_data)
+                )
+
+        # 3. Viz + orchestrator per query
+        async def answer(key):
+            if key in live:
+                return live[key]
+            item = gathered[key]
+            if isinstance(item, Exception):
+                local = self._local_lookup(unique[key], allow_stale=True) if is_upstream_failure(item) else None
+                if local is None:
+                    return self._error_result(item)
+                self.upstream.note_degraded()
+                item = local
+            try:
+                return await limited(self._answer_stages(unique[key], key, *item))
+            except Exception as e:
+                print(f"❌ Error in abatch_process: {e}")
+                return self._error_result(e)
+
+        answers = dict(zip(unique, await asyncio.gather(*(answer(key) for key in unique))))
+
+        results = []
+        for key, query in zip(keys, queries):
+            result = dict(answers[key], query=query)
+            if "error" not in result:
+                await self._record_history(session_id, query, result)
+            results.append(result)
+        return results
+
+    async def astream_query(self, user_query: str, session_id: str = DEFAULT_SESSION):
+        """Same pipeline as aprocess_query(), yielding stage events as they complete.
+
+        Events are dicts with ``event`` (search, data, chart, token, done, error)
+        and ``data``; orchestrator tokens are streamed as ``token`` deltas.
+        """
+        async with self._get_semaphore():
+            try:
+                live = self._live_answer(user_query)
+                if live is not None:
+                    await self._record_history(session_id, user_query, live)
+                    yield {"event": "done", "data": live}
+                    return
+
+                cache_key = await self._cache_key(user_query)
+                local = self._local_lookup(user_query)
+                if local is not None:
+                    search_results, structured_data = local
+                    yield {"event": "search", "data": {"search_results": search_results}}
+                else:
+                    search_sent = False
+                    try:
+                        search_results = await self._search_stage(user_query, cache_key)
+                        yield {"event": "search", "data": {"search_results": search_results}}
+                        search_sent = True
+                        structured_data = await self._data_stage(
+                            search_results, cache_key, game_logs=is_prediction_query(user_query)
+                        )
+                    except Exception as e:
+                        # Same stale stats-store fallback as _run_pipeline
+                        local = self._local_lookup(user_query, allow_stale=True) if is_upstream_failure(e) else None
+                        if local is None:
+                            raise
+                        self.upstream.note_degraded()
+                        search_results, structured_data = local
+                        if not search_sent:
+                            yield {"event": "search", "data": {"search_results": search_results}}
+                yield {"event": "data", "data": {"structured_data": structured_data}}
+
+                if is_prediction_query(user_query):
+                    # Numbers come from the local engine; the explanation is short, so no token stream
+                    result = await self._answer_stages(user_query, cache_key, search_results, structured_data)
+                    await self._record_history(session_id, user_query, result)
+                    yield {"event": "done", "data": result}
+                    return
 
-            return {
-                "answer": final_answer,
-                "structured_data": structured_data,
-                "visualization": chart_base64,
-                "search_results": search_results,
+                viz_json = None
+                chart_task = None
+                if self._needs_visualization(user_query):
+                    if self.wait_for_viz_context:
+                        viz_json = await self._viz_stage(user_query, structured_data, cache_key)
+                        chart_task = asyncio.create_task(self._render_chart(viz_json, cache_key))
+                    else:
+                        chart_task = asyncio.create_task(
+                            self._viz_and_chart_stage(user_query, structured_data, cache_key)
+                        )
+
+                chart_event = None
+                answer_parts = []
+                async for delta in self._stream_orchestrator(
+                    user_query, search_results, structured_data, viz_json, cache_key
+                ):
+                    answer_parts.append(delta)
+                    yield {"event": "token", "data": {"delta": delta}}
+                    if chart_task is not None and chart_task.done() and chart_event is None:
+                        viz_json, chart_event = self._chart_event(chart_task.result(), viz_json)
+                        yield chart_event
+
+                if chart_task is not None and chart_event is None:
+                    viz_json, chart_event = self._chart_event(await chart_task, viz_json)
+                    yield chart_event
+
+                chart_id = chart_event["data"]["chart_id"] if chart_event else None
+                result = self._build_result(
+                    search_results, structured_data, viz_json, chart_id, "".join(answer_parts)
+                )
+                await self._record_history(session_id, user_query, result)
+                yield {"event": "done", "data": result}
+
+            except Exception as e:
+                print(f"❌ Error in astream_query: {e}")
+                yield {"event": "error", "data": {"error": str(e)}}
+
+    def _chart_event(self, chart_result, viz_json):
+        """Unpack a finished chart task (with or without viz JSON) into a chart event."""
+        if isinstance(chart_result, tuple):
+            viz_json, chart_id = chart_result
+        else:
+            chart_id = chart_result
+        chart_title = viz_json.get("title") if isinstance(viz_json, dict) else ""
+        return viz_json, {
+            "event": "chart",
+            "data": {
+                "chart_id": chart_id,
+                "chart_url": chart_url(chart_id),
                 "chart_title": chart_title,
+            },
+        }
+
+    async def _record_history(self, session_id, user_query, result):
+        await self._offload(
+            self.conversation_history.append,
+            session_id,
+            {
+                "query": user_query,
+                "answer": result["answer"],
+                "data": result["structured_data"],
+                "visualization": result["visualization"],
+                "visualization_title": result["chart_title"],
             }
+        )
+
+    def _build_result(self, search_results, structured_data, viz_json, chart_id, final_answer):
+        chart_title = viz_json.get("title") if isinstance(viz_json, dict) else ""
+        return {
+            "answer": final_answer,
+            "structured_data": structured_data,
+            "visualization": chart_url(chart_id),
+            "chart_id": chart_id,
+            "search_results": search_results,
+            "chart_title": chart_title,
+        }
+
+    def _live_answer(self, user_query):
+        """Full result for a current-score query from the live game index, or None."""
+        games = self.live_games.lookup(user_query)
+        if not games:
+            return None
+        print("⚡ Answered from live game feed, skipping all agents")
+        age = self.live_games.stats()["seconds_since_refresh"]
+        answer = f"Live scores (updated {age:.0f}s ago):\n" + "\n".join(f"- {format_game(g)}" for g in games)
+        return self._build_result(
+            f"Source: live game feed (updated {age:.0f}s ago).",
+            json.dumps(games, indent=2),
+            None,
+            None,
+            answer,
+        )
+
+    def _local_lookup(self, user_query, allow_stale=False):
+        """(search_results, structured_data) from the stats store, or None.
+
+        Predictions need game logs, which the store never holds (season lines
+        only), so they always go to search unless the API is down.
+        """
+        if self.stats_store is None or (is_prediction_query(user_query) and not allow_stale):
+            return None
+        # Canonical form resolves aliases ("steph 3s this year") to stored names/seasons
+        records = self.stats_store.lookup(canonicalize_query(user_query), allow_stale=allow_stale)
+        if not records:
+            return None
+        if allow_stale:
+            print("⚠️ Upstream unavailable, answering from possibly stale local stats")
+            source = "Source: local NBA stats store (may be out of date; live search is unavailable)."
+        else:
+            print("⚡ Answered from local stats store, skipping Search + Data agents")
+            source = "Source: local NBA stats store (previously extracted from trusted sources)."
+        return source, json.dumps(records, indent=2)
+
+    async def _search_stage(self, user_query, cache_key):
+        cached = await self._cache_get("search", cache_key)
+        if cached is not None:
+            print("⚡ Search results served from cache")
+            return cached
+
+        print("1️⃣ Running Search Agent...")
+        search_query = user_query
+        if is_prediction_query(user_query):
+            search_query = f"{user_query}\n\n{GAME_LOG_SEARCH_HINT}"
+        search_response = await self._run_agent(self.search_agent, search_query, "search")
+        search_results = getattr(search_response, "data", str(search_response))
+        await self._cache_set("search", cache_key, search_results)
+        return search_results
+
+    async def _data_stage(self, search_results, cache_key, game_logs=False):
+        cached = await self._cache_get("data", cache_key)
+        if cached is not None:
+            print("⚡ Structured data served from cache")
+            return cached
 
+        print("2️⃣ Running Data Agent...")
+        search_context = truncate_to_tokens(dedupe_lines(search_results), context_budget("data_agent"))
+        data_prompt = f"Extract structured NBA data from these search results:\n\n{search_context}"
+        if game_logs:
+            data_prompt += f"\n\n{GAME_LOG_DATA_HINT}"
+        data_response = await self._run_agent(self.data_agent, data_prompt, "data")
+        structured_data = getattr(data_response, "data", str(data_response))
+        await self._cache_set("data", cache_key, structured_data)
+        if self.stats_store is not None:
+            self.stats_store.ingest(structured_data, cache_key)
+        return structured_data
+
+    def _merged_data_agent(self, group_size):
+        """data_agent with its output cap scaled to ``group_size`` queries."""
+        agent = self._merged_data_agents.get(group_size)
+        if agent is None:
+            per_query = self.data_agent.model_settings.max_tokens or AGENT_CONFIG["data_agent"]["max_tokens"]
+            settings = dataclasses.replace(
+                self.data_agent.model_settings,
+                max_tokens=min(per_query * group_size, BATCH_CONFIG["max_output_tokens"]),
+            )
+            agent = self._merged_data_agents[group_size] = self.data_agent.clone(model_settings=settings)
+        return agent
+
+    async def _merged_data_stage(self, items):
+        """One data-agent call for several ``(cache_key, search_results, game_logs)`` items.
+
+        Lines found in more than one query's results are sent once as shared
+        facts. Returns ``{cache_key: structured_data}`` for the queries the agent
+        answered; the caller extracts any missing ones individually.
+        """
+        if len(items) == 1:
+            key, search_results, game_logs = items[0]
+            return {key: await self._data_stage(search_results, key, game_logs=game_logs)}
+
+        print(f"2️⃣ Running Data Agent on {len(items)} merged search results...")
+        blocks = [dedupe_lines(search_results).splitlines() for _, search_results, _ in items]
+        seen_in = Counter(k for block in blocks for k in {line_key(line) for line in block})
+        shared = list(dict.fromkeys(
+            line for block in blocks for line in block if seen_in[line_key(line)] > 1
+        ))
+        budget = context_budget("data_agent")
+
+        sections = []
+        if shared:
+            sections.append("Shared facts (relevant to several queries):\n" + truncate_to_tokens("\n".join(shared), budget))
+        for number, (block, (_, _, game_logs)) in enumerate(zip(blocks, items), 1):
+            own = "\n".join(line for line in block if seen_in[line_key(line)] == 1)
+            hint = f"\n{GAME_LOG_DATA_HINT}" if game_logs else ""
+            sections.append(f"### Query {number}{hint}\n{truncate_to_tokens(own, budget) or '(see shared facts)'}")
+
+        data_prompt = (
+            "Extract structured NBA data for each numbered query below from its search results "
+            "(and the shared facts). Return ONLY a JSON object in a ```json block``` mapping each "
+            "query number (\"1\", \"2\", ...) to that query's structured data. Keep game logs "
+            "as one row per game (date, opponent, stats).\n\n"
+            + "\n\n".join(sections)
+        )
+        data_response = await self._run_agent(self._merged_data_agent(len(items)), data_prompt, "data_batch")
+        raw = getattr(data_response, "data", str(data_response))
+        parsed = self._safe_json_parse(raw) or {}
+
+        extracted = {}
+        for number, (key, _, _) in enumerate(items, 1):
+            value = parsed.get(str(number))
+            if value in (None, "", [], {}):
+                continue
+            structured_data = value if isinstance(value, str) else json.dumps(value, indent=2)
+            await self._cache_set("data", key, structured_data)
+            if self.stats_store is not None:
+                self.stats_store.ingest(structured_data, key)
+            extracted[key] = structured_data
+        return extracted
+
+    async def _viz_stage(self, user_query, structured_data, cache_key):
+        """Ask the visualization agent for chart JSON; None if unusable."""
+        cached = await self._cache_get("viz", cache_key)
+        if cached is not None:
+            print("⚡ Visualization JSON served from cache")
+            return cached
+
+        # Well-formed stat records compile to a chart spec without the LLM
+        with metrics.span("viz.compile_spec"):
+            viz_json = compile_chart_spec(structured_data)
+        if viz_json is not None:
+            print("⚡ Chart spec compiled from structured data")
+            await self._cache_set("viz", cache_key, viz_json)
+            return viz_json
+
+        print("📊 Visualization requested...")
+        data_context = truncate_to_tokens(
+            compact_structured_data(structured_data), context_budget("visualization_agent")
+        )
+        viz_prompt = (
+            f"Generate a visualization for: '{user_query}'.\n"
+            f"Use this structured data:\n{data_context}\n\n"
+            f"Return JSON with 'title', 'type', 'labels', and 'datasets'."
+        )
+        try:
+            viz_response = await self._run_agent(self.viz_agent, viz_prompt, "viz")
         except Exception as e:
-            print(f"❌ Error in process_query: {e}")
-            return {
-                "answer": f"An error occurred: {e}",
-                "structured_data": None,
-                "visualization": None,
-                "search_results": None,
-            }
+            if not is_upstream_failure(e):
+                raise
+            # A chart is optional: skip it rather than fail the answer
+            print(f"⚠️ Visualization Agent unavailable ({type(e).__name__}), skipping chart.")
+            self.upstream.note_degraded()
+            return None
+        viz_json_raw = getattr(viz_response, "data", str(viz_response))
+        with metrics.span("viz.parse_json"):
+            viz_json = self._safe_json_parse(viz_json_raw)
+        if not isinstance(viz_json, dict):
+            print("⚠️ Invalid visualization JSON received, skipping chart.")
+            return None
+        await self._cache_set("viz", cache_key, viz_json)
+        return viz_json
+
+    async def _render_chart(self, viz_json, cache_key):
+        """Render viz JSON via the render service into the chart store; returns the chart id."""
+        if not isinstance(viz_json, dict):
+            return None
+
+        cached = await self._cache_get("chart", cache_key)
+        if cached is not None and self.chart_store.contains(cached):
+            return cached
+
+        # normalize_chart_spec() understands the agent's nested "data" format
+        # (keeping visualization_type, so scatter/table specs render as such)
+        chart_id = chart_spec_hash(viz_json)
+        if chart_id is None:
+            return None
+
+        try:
+            with metrics.span("chart.render"):
+                if not self.chart_store.contains(chart_id):
+                    png = await self.render_service.arender(viz_json)
+                    if not png:
+                        return None
+                    await asyncio.to_thread(self.chart_store.save, chart_id, png)
+        except Exception as chart_err:
+            print(f"⚠️ Chart generation failed: {chart_err}")
+            return None
+        await self._cache_set("chart", cache_key, chart_id)
+        return chart_id
+
+    async def _viz_and_chart_stage(self, user_query, structured_data, cache_key):
+        viz_json = await self._viz_stage(user_query, structured_data, cache_key)
+        chart_id = await self._render_chart(viz_json, cache_key)
+        return viz_json, chart_id
+
+    async def _orchestrator_stage(
+        self, user_query, search_results, structured_data, viz_json, cache_key
+    ):
+        cached = await self._cache_get("answer", cache_key)
+        if cached is not None:
+            print("⚡ Answer served from cache")
+            return cached
+
+        print("4️⃣ Running Orchestrator Agent...")
+        final_prompt = self._orchestrator_prompt(user_query, search_results, structured_data, viz_json)
+        orchestrator = self.route_orchestrator(user_query)
+        try:
+            final_response = await self._run_agent(orchestrator, final_prompt, "orchestrator")
+        except Exception as e:
+            if not is_upstream_failure(e):
+                raise
+            return self._fallback_answer(structured_data, e)
+        final_answer = getattr(final_response, "data", str(final_response))
+        await self._cache_set("answer", cache_key, final_answer)
+        return final_answer
+
+    async def _stream_orchestrator(
+        self, user_query, search_results, structured_data, viz_json, cache_key
+    ):
+        """Yield orchestrator text deltas as the model produces them."""
+        cached = await self._cache_get("answer", cache_key)
+        if cached is not None:
+            print("⚡ Answer served from cache")
+            yield cached
+            return
+
+        print("4️⃣ Streaming Orchestrator Agent...")
+        final_prompt = self._orchestrator_prompt(user_query, search_results, structured_data, viz_json)
+        orchestrator = self.route_orchestrator(user_query)
+        runs = []
+
+        async def deltas():
+            result = Runner.run_streamed(orchestrator, final_prompt)
+            runs.append(result)
+            async for event in result.stream_events():
+                if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                    yield event.data.delta
+
+        streamed = False
+        try:
+            with metrics.span("agent.orchestrator", model=str(orchestrator.model), streamed=True):
+                async for delta in self.upstream.stream(str(orchestrator.model), "orchestrator", deltas):
+                    streamed = True
+                    yield delta
+        except Exception as e:
+            if not is_upstream_failure(e):
+                raise
+            # Same data-only answer as /chat; after a partial answer it follows on
+            fallback = self._fallback_answer(structured_data, e)
+            yield f"\n\n{fallback}" if streamed else fallback
+            return
+        result = runs[-1]
+        usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+        metrics.record_usage("orchestrator", orchestrator.model, usage)
+
+        final_answer = result.final_output
+        await self._cache_set("answer", cache_key, final_answer if isinstance(final_answer, str) else str(final_answer))
+
+    def _fallback_answer(self, structured_data, error):
+        """Data-only answer when the orchestrator can't be reached; never cached."""
+        print(f"⚠️ Orchestrator unavailable ({type(error).__name__}), answering with the data alone.")
+        self.upstream.note_degraded()
+        data = compact_structured_data(structured_data) or "No data available."
+        return (
+            "The analysis service is busy right now, so here is the data I found "
+            f"without a written summary:\n\n{data}"
+        )
+
+    def _orchestrator_prompt(self, user_query, search_results, structured_data, viz_json):
+        # Structured data carries the numbers, so it gets the budget first; search
+        # results (for context and sources) get the rest, and the chart is summarized
+        context = compact_sections(
+            [
+                ("data", compact_structured_data(structured_data)),
+                ("viz", summarize_viz(viz_json)),
+                ("search", dedupe_lines(search_results)),
+            ],
+            context_budget("orchestrator"),
+        )
+        return (
+            f"User query: {user_query}\n\n"
+            f"Search results: {context['search']}\n\n"
+            f"Structured data: {context['data']}\n\n"
+            f"Visualization: {context['viz']}\n\n"
+            f"Provide a concise, factual, conversational summary for the user."
+        )
 
     def _safe_json_parse(self, raw):
         """Extract valid JSON safely."""
@@ -146,40 +916,101 @@ class NBAStatsChatbot:
 
     def _needs_visualization(self, query: str) -> bool:
         """Detect if query needs visualization."""
+        parsed = parse_query(query)
+        # Any stat (incl. shorthand like "3s" or "dimes") or several players/teams
+        if parsed["stats"] or len(parsed["players"]) + len(parsed["teams"]) > 1:
+            return True
         keywords = [
             "compare", "vs", "trend", "over time", "chart", "graph",
             "visualize", "plot", "career", "leaders", "ranking",
-            "stats", "points", "rebounds", "assists", "shooting", "matchup"
+            "stats", "shooting", "matchup"
         ]
-        return any(k in query.lower() for k in keywords)
+        return any(k in parsed["canonical"] for k in keywords)
 
 
 # ------------------------------------
 #   FLASK SERVER SETUP
 # ------------------------------------
-app = Flask(__name__)
-CORS(app)
-bot = NBAStatsChatbot()
-
-@app.route("/chat", methods=["POST"])
-def chat():
-    try:
-        user_input = request.json.get("message", "")
-        if not user_input:
-            return jsonify({"error": "Missing 'message' field"}), 400
-
-        result = bot.process_query(user_input)
-        return jsonify({
-            "reply": result.get("answer", ""),
-            "has_visualization": bool(result.get("visualization")),
-            "chart_image": result.get("visualization"),
-            "chart_title": result.get("chart_title", "")
-        })
-    except Exception as e:
-        print(f"Server error: {e}")
-        return jsonify({"error": str(e)}), 500
+def create_app(bot=None):
+    """Flask app around a chatbot; Flask is only imported when this is called."""
+    from flask import Flask, request, jsonify, make_response
+    from flask_cors import CORS
+
+    app = Flask(__name__)
+    CORS(app)
+    bot = bot or NBAStatsChatbot()
+    app.config["CHATBOT"] = bot
+    if bot.live_refresher is not None:
+        bot.live_refresher.start(bot._ensure_loop())
+
+    @app.route("/chat", methods=["POST"])
+    def chat():
+        try:
+            user_input = request.json.get("message", "")
+            if not user_input:
+                return jsonify({"error": "Missing 'message' field"}), 400
+
+            session_id = request.json.get("session_id") or DEFAULT_SESSION
+            result = bot.process_query(user_input, session_id)
+            return jsonify({
+                "reply": result.get("answer", ""),
+                "has_visualization": bool(result.get("visualization")),
+                "chart_url": result.get("visualization"),
+                "chart_title": result.get("chart_title", "")
+            })
+        except Exception as e:
+            print(f"Server error: {e}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/chat/batch", methods=["POST"])
+    def chat_batch():
+        try:
+            queries = [q.strip() for q in request.json.get("queries", []) if isinstance(q, str) and q.strip()]
+            if not queries:
+                return jsonify({"error": "Missing 'queries' list"}), 400
+            if len(queries) > BATCH_CONFIG["max_queries"]:
+                return jsonify({"error": f"At most {BATCH_CONFIG['max_queries']} queries per batch"}), 400
+
+            session_id = request.json.get("session_id") or DEFAULT_SESSION
+            results = bot.process_batch(queries, session_id)
+            return jsonify({"results": [
+                {
+                    "query": result["query"],
+                    "reply": result.get("answer", ""),
+                    "has_visualization": bool(result.get("visualization")),
+                    "chart_url": result.get("visualization"),
+                    "chart_title": result.get("chart_title", "")
+                }
+                for result in results
+            ]})
+        except Exception as e:
+            print(f"Server error: {e}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/charts/<chart_id>.png", methods=["GET"])
+    def chart_image(chart_id):
+        png = bot.chart_store.get(chart_id)
+        if png is None:
+            return jsonify({"error": "Chart not found"}), 404
+
+        response = make_response(png)
+        response.headers["Content-Type"] = "image/png"
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        response.set_etag(chart_id)  # content hash, so the ETag is strong
+        return response.make_conditional(request)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return jsonify(bot.metrics_snapshot())
+
+    return app
 
 
 if __name__ == "__main__":
-    print("🏀 Flask backend running at http://127.0.0.1:8000")
-    app.run(host="127.0.0.1", port=8000, debug=True)
+    configure_logging()
+    render_service.start()
+    app = create_app()
+    host, port = DEPLOYMENT_CONFIG["host"], DEPLOYMENT_CONFIG["port"]
+    # Single-process dev server; for multiple workers run serve.py (FastAPI via uvicorn)
+    print(f"🏀 Flask backend running at http://{host}:{port}")
+    app.run(host=host, port=port, debug=DEPLOYMENT_CONFIG["debug"])
@@ -0,0 +1,124 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import LOG_LEVEL, LOG_FILE, MODEL_PRICING
+
+logger = logging.getLogger("nba_chatbot")
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def configure_logging():
+    """Send structured span logs to LOG_FILE at LOG_LEVEL (idempotent)."""
+    if logger.handlers:
+        return
+    logger.setLevel(LOG_LEVEL)
+    handler = logging.FileHandler(LOG_FILE)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+
+
+class Histogram:
+    """Bucketed latency histogram plus a sample window for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS, window=1024):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=window)
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._samples.append(value)
+
+    def percentile(self, pct):
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def snapshot(self):
+        labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max, 2),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class PipelineMetrics:
+    """Per-stage latency histograms, error counts and token/cost totals."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._latency = {}
+            self._errors = {}
+            self._usage = {}
+
+    @contextmanager
+    def span(self, name, **fields):
+        """Time a block; logged as one JSON line and folded into its histogram."""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._latency.setdefault(name, Histogram()).observe(elapsed_ms)
+                if status == "error":
+                    self._errors[name] = self._errors.get(name, 0) + 1
+            logger.info(json.dumps({"span": name, "ms": round(elapsed_ms, 2), "status": status, **fields}))
+
+    def record_usage(self, stage, model, usage):
+        """Add token usage from a Runner result (``result.context_wrapper.usage``)."""
+        if usage is None:
+            return
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        price = MODEL_PRICING.get(str(model), {"input": 0.0, "output": 0.0})
+        cost = (input_tokens * price["input"] + output_tokens * price["output"]) / 1_000_000
+        with self._lock:
+            # Keyed per stage and model, since routing can send a stage to several models
+            totals = self._usage.setdefault(
+                f"{stage}/{model}",
+                {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0},
+            )
+            totals["requests"] += getattr(usage, "requests", 1) or 1
+            totals["input_tokens"] += input_tokens
+            totals["output_tokens"] += output_tokens
+            totals["cost_usd"] = round(totals["cost_usd"] + cost, 6)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "latency": {name: h.snapshot() for name, h in self._latency.items()},
+                "errors": dict(self._errors),
+                "usage": {key: dict(totals) for key, totals in self._usage.items()},
+                "total_cost_usd": round(sum(t["cost_usd"] for t in self._usage.values()), 6),
+            }
+
+
+metrics = PipelineMetrics()
@@ -0,0 +1,12 @@
+from agents import ModelSettings
+from config import AGENT_CONFIG
+
+
+def model_settings(agent_key, **overrides):
+    """ModelSettings for an agent from AGENT_CONFIG (temperature + output token cap)."""
+    settings = AGENT_CONFIG[agent_key]
+    return ModelSettings(
+        temperature=settings.get("temperature"),
+        max_tokens=settings.get("max_tokens"),
+        **overrides,
+    )
@@ -1,4 +1,6 @@
-from agents import Agent, ModelSettings
+from agents import Agent
+from config import DEFAULT_MODEL
+from nba_agents.agent_config import model_settings
 
 INSTRUCTIONS = (
     "You are an NBA data extraction and structuring specialist. "
@@ -23,6 +25,6 @@ INSTRUCTIONS = (
 data_agent = Agent(
     name="Data Processing Agent",
     instructions=INSTRUCTIONS,
-    model="gpt-4o-mini",
-    model_settings=ModelSettings(temperature=0.1),  # Low temperature for accuracy
+    model=DEFAULT_MODEL,
+    model_settings=model_settings("data_agent"),  # Low temperature for accuracy
 )
\ No newline at end of file
@@ -1,4 +1,6 @@
 from agents import Agent, ModelSettings
+from config import ORCHESTRATOR_MODEL, MODEL_ROUTING
+from nba_agents.agent_config import model_settings
 from nba_agents.search_agent import search_agent
 from nba_agents.data_agent import data_agent
 from nba_agents.visualization_agent import visualization_agent
@@ -36,6 +38,15 @@ INSTRUCTIONS = (
 orchestrator_agent = Agent(
     name="NBA Stats Orchestrator",
     instructions=INSTRUCTIONS,
-    model="gpt-4o",  
-    model_settings=ModelSettings(temperature=0.3),
+    model=ORCHESTRATOR_MODEL,
+    model_settings=model_settings("orchestrator"),
+)
+
+# Same instructions on the cheaper model with a tighter output cap, for simple lookups
+simple_orchestrator_agent = orchestrator_agent.clone(
+    name="NBA Stats Orchestrator (fast)",
+    model=MODEL_ROUTING["simple_model"],
+    model_settings=orchestrator_agent.model_settings.resolve(
+        ModelSettings(max_tokens=MODEL_ROUTING["simple_max_tokens"])
+    ),
 )
\ No newline at end of file
@@ -1,28 +1,28 @@
-from agents import Agent, ModelSettings
+from agents import Agent
+from config import DEFAULT_MODEL
+from nba_agents.agent_config import model_settings
 
 INSTRUCTIONS = (
-    "You are an NBA Prediction Agent specialized in forecasting player and team performance using historical data. "
-    "You receive structured data (from the Data Processing Agent) containing past stats, matchups, and game contexts. "
-    "Your job is to select and apply appropriate machine learning models to predict upcoming performance metrics.\n\n"
-    
-    "Workflow:\n"
-    "1. Identify the type of prediction requested (player performance, team win probability, etc.)\n"
-    "2. Use structured data (past game stats, averages, trends, matchup history) to prepare model inputs\n"
-    "3. Apply suitable ML techniques (e.g., regression, random forest, or time-series models) depending on data type\n"
-    "4. Output clear numeric predictions with confidence scores or reasoning\n\n"
-    
+    "You are an NBA Prediction Agent. Predictions are computed locally by a statistical model "
+    "(recent and exponentially weighted averages, a least-squares trend, head-to-head opponent "
+    "adjustments, and for team matchups projected scores and win probability). "
+    "You receive the user's question and the model output as JSON; your job is to explain it.\n\n"
+
+    "Input fields:\n"
+    "- players / teams: predicted_stats, recent_average, interval (low, high), confidence (0-1), games_used, opponent\n"
+    "- matchups: predicted_score, predicted_margin, win_probability, home_team\n\n"
+
     "Guidelines:\n"
-    "- Never invent or guess stats — only infer from real data.\n"
-    "- Explain briefly why a prediction makes sense (e.g., 'based on last 5 matchups vs. Boston, Giannis averages 31.2 PPG').\n"
-    "- Use JSON-like output for model predictions for easy visualization.\n\n"
-    
-    "Example Output:\n"
-    "{player: 'Jayson Tatum', opponent: 'Milwaukee Bucks', predicted_stats: {points: 27.5, rebounds: 8.2, assists: 4.1}, confidence: 0.82}\n"
+    "- Use the numbers exactly as given. Never change, invent or re-estimate them.\n"
+    "- Lead with the prediction, then explain briefly why (e.g., 'up from his 27.1 PPG over the last 10 games, "
+    "and he has averaged more against Milwaukee').\n"
+    "- Mention the range and confidence so the user knows how certain it is.\n"
+    "- Keep it concise and conversational; no JSON in the answer.\n"
 )
 
 prediction_agent = Agent(
     name="NBA Prediction Agent",
     instructions=INSTRUCTIONS,
-    model="gpt-4o-mini",  #  integrate ML code here, GPT-4o acts as the reasoning layer
-    model_settings=ModelSettings(temperature=0.1),
+    model=DEFAULT_MODEL,  # Numbers come from prediction_engine; the model only explains them
+    model_settings=model_settings("prediction_agent"),
 )
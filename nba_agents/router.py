@@ -0,0 +1,46 @@
+import re
+
+from config import MODEL_ROUTING
+from nba_agents.orchestrator_agent import orchestrator_agent, simple_orchestrator_agent
+from query_normalizer import SEASON_RE, parse_query
+
+_SUBJECT_SEPARATORS = re.compile(r",|\band\b|&|/")
+_COMPLEX_KEYWORDS = re.compile(
+    r"\b(?:" + "|".join(re.escape(k) for k in MODEL_ROUTING["complex_keywords"]) + r")\b"
+)
+
+
+def count_subjects(query: str) -> int:
+    """Players/teams a query is about.
+
+    Named players and teams (query_normalizer aliases) are counted directly.
+    Otherwise "," / "and" / "&" / "/" separated parts are counted, ignoring
+    seasons ("2015/16") and parts that only name stats ("points and rebounds").
+    """
+    parsed = parse_query(query)
+    named = len(parsed["players"]) + len(parsed["teams"])
+    if named:
+        return named
+    text = SEASON_RE.sub(" ", query.lower())
+    subjects = 0
+    for part in _SUBJECT_SEPARATORS.split(text):
+        part_parsed = parse_query(part)
+        words = set(part_parsed["canonical"].split()) - set(part_parsed["seasons"])
+        for stat in part_parsed["stats"]:
+            words -= set(stat.split())
+        subjects += bool(words)
+    return subjects
+
+
+def is_complex_query(query: str) -> bool:
+    """Comparisons, rankings and multi-subject questions need the larger model."""
+    if _COMPLEX_KEYWORDS.search(query.lower()):
+        return True
+    return count_subjects(query) > MODEL_ROUTING["max_simple_entities"]
+
+
+def route_orchestrator(query: str):
+    """Orchestrator agent to use for ``query``."""
+    if not MODEL_ROUTING["enabled"] or is_complex_query(query):
+        return orchestrator_agent
+    return simple_orchestrator_agent
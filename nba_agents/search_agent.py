@@ -1,4 +1,6 @@
-from agents import Agent, WebSearchTool, ModelSettings
+from agents import Agent, WebSearchTool
+from config import DEFAULT_MODEL, AGENT_CONFIG
+from nba_agents.agent_config import model_settings
 
 
 INSTRUCTIONS = (
@@ -12,7 +14,7 @@ INSTRUCTIONS = (
 search_agent = Agent(
     name="Search agent",
     instructions=INSTRUCTIONS,
-    tools=[WebSearchTool()],
-    model="gpt-4o-mini",
-    model_settings=ModelSettings(tool_choice="required"),
+    tools=[WebSearchTool(search_context_size=AGENT_CONFIG["search_agent"]["search_context_size"])],
+    model=DEFAULT_MODEL,
+    model_settings=model_settings("search_agent", tool_choice="required"),
 )
\ No newline at end of file
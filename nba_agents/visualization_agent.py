@@ -1,5 +1,6 @@
-from agents import Agent, ModelSettings
-import json
+from agents import Agent
+from config import DEFAULT_MODEL
+from nba_agents.agent_config import model_settings
 
 INSTRUCTIONS = (
     "You are an NBA data visualization specialist. "
@@ -67,5 +68,6 @@ INSTRUCTIONS = (
 visualization_agent = Agent(
     name="Visualization Agent",
     instructions=INSTRUCTIONS,
-    model="gpt-4o-mini",
+    model=DEFAULT_MODEL,
+    model_settings=model_settings("visualization_agent"),
 )
@@ -0,0 +1,344 @@
+import math
+import re
+from functools import lru_cache
+
+from cache_utils import normalize_query
+from config import PREDICTION_CONFIG
+from query_normalizer import TEAM_ABBREVIATIONS, parse_query
+from record_utils import extract_rows, stat_key, to_number
+
+# pandas is imported on first prediction, keeping it out of server start-up
+
+# Whole words only, like cache_utils.LIVE_RE: "unexpected" and "unpredictable" are not predictions
+PREDICTION_KEYWORDS = (
+    "predict", "predicts", "predicted", "prediction", "predictions", "projection", "projections",
+    "project", "projected", "forecast", "forecasts", "expected", "expect", "will score",
+    "going to score", "over under", "win probability", "chance to win", "who will win",
+)
+PREDICTION_RE = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in PREDICTION_KEYWORDS) + r")\b")
+# "When is the Lakers next game" is a schedule question; with a stat or "will" it asks for a projection
+NEXT_GAME_RE = re.compile(r"\bnext (?:game|matchup)\b")
+
+# Appended to search/data prompts for prediction queries: the engine needs game logs
+GAME_LOG_SEARCH_HINT = (
+    "Include recent game logs: date, opponent, home/away and box-score stats "
+    "for each of the last 10 games of every player or team involved."
+)
+GAME_LOG_DATA_HINT = (
+    "Return the game logs as a JSON list with one row per game: player or team, date, "
+    "opponent, home (true/false) and numeric stats (for teams also opp_points)."
+)
+
+# Game-log columns (after record_utils.stat_key) -> canonical stat
+STAT_COLUMNS = {
+    "points": ("points", "pts"),
+    "rebounds": ("rebounds", "reb", "trb"),
+    "assists": ("assists", "ast"),
+    "steals": ("steals", "stl"),
+    "blocks": ("blocks", "blk"),
+    "three_pointers": ("3pm", "fg3m", "threes", "three_pointers", "three_pointers_made"),
+    "minutes": ("minutes", "min", "mp"),
+}
+ALLOWED_COLUMNS = ("opp_points", "opponent_points", "opp_pts", "points_allowed", "opp_score")
+OPPONENT_COLUMNS = ("opponent", "opp", "vs", "against")
+DATE_COLUMNS = ("date", "game_date")
+
+
+def is_prediction_query(query) -> bool:
+    q = normalize_query(query)
+    if PREDICTION_RE.search(q):
+        return True
+    return bool(NEXT_GAME_RE.search(q)) and (" will " in f" {q} " or bool(parse_query(q)["stats"]))
+
+
+@lru_cache(maxsize=1024)
+def _canonical_team(name):
+    """'@ BOS' / 'Celtics' / 'Boston Celtics' -> 'boston celtics'."""
+    teams = parse_query(name)["teams"]
+    if teams:
+        return teams[0]
+    name = re.sub(r"^(?:@|vs\.?|at)\s*", "", normalize_query(name)).strip()
+    return TEAM_ABBREVIATIONS.get(name, name)
+
+
+def _first_number(row, names):
+    for name in names:
+        number = to_number(row.get(name))
+        if number is not None:
+            return number
+    return None
+
+
+def game_log_frame(structured_data):
+    """DataFrame of per-game rows from data-agent output, oldest game first.
+
+    Columns: entity, entity_type, opponent, home, date, game (index within
+    the entity's log) and whichever STAT_COLUMNS / opp_points are present.
+    Entities with fewer than ``min_games`` rows are dropped; None if nothing
+    is left.
+    """
+    import pandas as pd
+
+    rows = []
+    for order, raw in enumerate(extract_rows(structured_data)):
+        row = {stat_key(k): v for k, v in raw.items()}
+        if isinstance(row.get("player"), str):
+            entity_type, entity = "player", row["player"].strip()
+        elif isinstance(row.get("team"), str):
+            entity_type, entity = "team", _canonical_team(row["team"])
+        else:
+            continue
+
+        opponent = next((row[k] for k in OPPONENT_COLUMNS if isinstance(row.get(k), str)), None)
+        if isinstance(row.get("home"), bool):
+            home = row["home"]
+        elif isinstance(row.get("location"), str):
+            home = row["location"].strip().lower().startswith("h")
+        else:
+            home = not opponent.strip().startswith("@") if opponent else None
+
+        out = {
+            "entity": entity,
+            "entity_type": entity_type,
+            "opponent": _canonical_team(opponent) if opponent else None,
+            "home": home,
+            "date": next((row[k] for k in DATE_COLUMNS if row.get(k)), None),
+            "order": order,
+        }
+        for stat, names in STAT_COLUMNS.items():
+            out[stat] = _first_number(row, names)
+        out["opp_points"] = _first_number(row, ALLOWED_COLUMNS)
+        rows.append(out)
+
+    if not rows:
+        return None
+    frame = pd.DataFrame(rows).dropna(axis=1, how="all")
+    if "date" in frame:
+        frame["date"] = pd.to_datetime(frame["date"], errors="coerce")
+        frame = frame.sort_values(["date", "order"], na_position="first", kind="stable")
+    frame = frame[frame.groupby("entity")["order"].transform("size") >= PREDICTION_CONFIG["min_games"]]
+    if frame.empty:
+        return None
+    frame = frame.assign(game=frame.groupby("entity").cumcount())
+    return frame.reset_index(drop=True)
+
+
+def _stats_in(frame):
+    return [s for s in STAT_COLUMNS if s in frame]
+
+
+def project_entities(frame, opponent=None):
+    """Next-game projection for every entity and stat in ``frame`` at once.
+
+    Blends (PREDICTION_CONFIG['weights']) an exponentially weighted mean,
+    the plain mean of the last ``window`` games and a least-squares trend
+    extrapolated one game ahead, then adds the entity's head-to-head
+    difference against ``opponent``, shrunk toward zero for small samples.
+    Everything is grouped pandas/numpy arithmetic, so a whole slate of
+    players costs about the same as one.
+    """
+    import numpy as np
+    import pandas as pd
+
+    cfg = PREDICTION_CONFIG
+    stats = _stats_in(frame)
+    if not stats:
+        return []
+
+    recent = frame.groupby("entity", sort=False).tail(cfg["window"])
+    by_entity = recent["entity"]
+    values = recent[stats]
+    average = values.groupby(by_entity, sort=False).mean()
+    spread = values.groupby(by_entity, sort=False).std(ddof=1).fillna(0.0)
+    ewm = (
+        values.groupby(by_entity, sort=False)
+        .ewm(span=cfg["ewm_span"], ignore_na=True)
+        .mean()
+        .groupby(level=0, sort=False)
+        .last()
+    )
+
+    # Closed-form least squares per entity and stat: y = a + b * x over the window
+    x = recent.groupby("entity", sort=False).cumcount().astype(float)
+    valid = values.notna()
+    xs = pd.DataFrame({s: x for s in stats}, index=recent.index).where(valid)
+
+    def total(df):
+        return df.groupby(by_entity, sort=False).sum()
+
+    n, sx, sy, sxx, sxy = total(valid.astype(float)), total(xs), total(values), total(xs ** 2), total(xs * values)
+    slope = ((n * sxy - sx * sy) / (n * sxx - sx ** 2).replace(0, np.nan)).fillna(0.0)
+    next_x = x.groupby(by_entity, sort=False).max() + 1
+    trend = (sy - slope * sx) / n.replace(0, np.nan) + slope.mul(next_x, axis=0)
+    trend = trend.where(n >= cfg["min_trend_games"], average).clip(lower=0)
+
+    weights = cfg["weights"]
+    projection = weights["ewm"] * ewm + weights["average"] * average + weights["trend"] * trend
+
+    adjustment = pd.DataFrame(0.0, index=projection.index, columns=stats)
+    if opponent:
+        overall = frame.groupby("entity", sort=False)[stats].mean()
+        against = frame[frame["opponent"] == opponent] if "opponent" in frame else frame.iloc[0:0]
+        if not against.empty:
+            grouped = against.groupby("entity", sort=False)[stats]
+            count = grouped.count()
+            shrink = count / (count + cfg["opponent_shrinkage_games"])
+            diff = ((grouped.mean() - overall.reindex(grouped.mean().index)) * shrink).fillna(0.0)
+            adjustment = adjustment.add(diff, fill_value=0.0).reindex(projection.index).fillna(0.0)
+    projection = (projection + adjustment).clip(lower=0)
+
+    z = cfg["interval_z"]
+    games = recent.groupby("entity", sort=False).size()
+    relative_spread = (spread / average.replace(0, np.nan)).mean(axis=1).fillna(1.0)
+    confidence = ((1 - relative_spread).clip(0.05, 0.95) * (games / cfg["window"]).clip(upper=1.0)).round(2)
+
+    entity_types = frame.groupby("entity", sort=False)["entity_type"].first()
+    results = []
+    for entity in projection.index:
+        available = [s for s in stats if not math.isnan(projection.at[entity, s])]
+        if not available:
+            continue
+        results.append({
+            entity_types[entity]: entity,
+            "opponent": opponent,
+            "games_used": int(games[entity]),
+            "predicted_stats": {s: round(float(projection.at[entity, s]), 1) for s in available},
+            "recent_average": {s: round(float(average.at[entity, s]), 1) for s in available},
+            "interval": {
+                s: [
+                    round(max(0.0, float(projection.at[entity, s] - z * spread.at[entity, s])), 1),
+                    round(float(projection.at[entity, s] + z * spread.at[entity, s]), 1),
+                ]
+                for s in available
+            },
+            "confidence": float(confidence[entity]),
+        })
+    return results
+
+
+def predict_matchup(frame, team_a, team_b, home_team=None):
+    """Projected score and win probability for ``team_a`` vs ``team_b``.
+
+    Each side's expected score averages its own recent scoring with the
+    opponent's recent points allowed; the margin (plus home court) maps to a
+    win probability through a normal distribution with ``margin_std``.
+    """
+    cfg = PREDICTION_CONFIG
+    if "points" not in frame or "opp_points" not in frame:
+        return None
+    teams = frame[frame["entity"].isin([team_a, team_b])].groupby("entity").tail(cfg["window"])
+    form = teams.groupby("entity")[["points", "opp_points"]].mean()
+    if team_a not in form.index or team_b not in form.index or form.isna().any().any():
+        return None
+
+    score_a = (form.at[team_a, "points"] + form.at[team_b, "opp_points"]) / 2
+    score_b = (form.at[team_b, "points"] + form.at[team_a, "opp_points"]) / 2
+    if home_team in (team_a, team_b):
+        edge = cfg["home_court_points"] / 2
+        score_a, score_b = (score_a + edge, score_b - edge) if home_team == team_a else (score_a - edge, score_b + edge)
+    margin = score_a - score_b
+    win_probability = 0.5 * (1 + math.erf(margin / (cfg["margin_std"] * math.sqrt(2))))
+    return {
+        "team": team_a,
+        "opponent": team_b,
+        "home_team": home_team,
+        "predicted_score": {team_a: round(float(score_a), 1), team_b: round(float(score_b), 1)},
+        "predicted_margin": round(float(margin), 1),
+        "win_probability": round(win_probability, 3),
+    }
+
+
+def predict(structured_data, query):
+    """Predictions for ``query`` from game logs in ``structured_data``, or None.
+
+    Player rows get next-game stat projections (adjusted for the opponent when
+    the query names one team); when the query names two teams with game logs,
+    each pair gets a matchup forecast.
+    """
+    frame = game_log_frame(structured_data)
+    if frame is None:
+        return None
+
+    teams = parse_query(query)["teams"]
+    q = normalize_query(query)
+    result = {"players": [], "matchups": []}
+
+    players = frame[frame["entity_type"] == "player"]
+    if not players.empty:
+        result["players"] = project_entities(players, teams[0] if len(teams) == 1 else None)
+
+    team_rows = frame[frame["entity_type"] == "team"]
+    if not team_rows.empty:
+        if len(teams) >= 2:
+            for team_a, team_b in zip(teams[0::2], teams[1::2]):
+                # "Celtics at Knicks": the second team hosts
+                home_team = team_b if " at " in f" {q} " else None
+                matchup = predict_matchup(team_rows, team_a, team_b, home_team)
+                if matchup:
+                    result["matchups"].append(matchup)
+        else:
+            result["teams"] = project_entities(team_rows)
+
+    if not any(result.values()):
+        return None
+    return result
+
+
+def prediction_chart_spec(predictions):
+    """Bar chart of projections (vs recent average for a single player); None if empty."""
+    players = predictions.get("players") or []
+    if len(players) == 1:
+        p = players[0]
+        stats = list(p["predicted_stats"])
+        return {
+            "title": f"{p['player']}: Next Game Projection",
+            "type": "bar",
+            "labels": [s.replace("_", " ").title() for s in stats],
+            "datasets": [
+                {"label": f"Last {p['games_used']} avg", "data": [p["recent_average"][s] for s in stats]},
+                {"label": "Projection", "data": [p["predicted_stats"][s] for s in stats]},
+            ],
+        }
+    if players:
+        stats = [s for s in players[0]["predicted_stats"] if all(s in p["predicted_stats"] for p in players)]
+        return {
+            "title": "Next Game Projections",
+            "type": "bar",
+            "labels": [s.replace("_", " ").title() for s in stats],
+            "datasets": [
+                {"label": p["player"], "data": [p["predicted_stats"][s] for s in stats]} for p in players
+            ],
+        }
+    matchups = predictions.get("matchups") or []
+    if matchups:
+        return {
+            "title": "Projected Scores",
+            "type": "bar",
+            "labels": [f"{m['team'].title()} vs {m['opponent'].title()}" for m in matchups],
+            "datasets": [
+                {"label": "Team", "data": [m["predicted_score"][m["team"]] for m in matchups]},
+                {"label": "Opponent", "data": [m["predicted_score"][m["opponent"]] for m in matchups]},
+            ],
+        }
+    return None
+
+
+def format_predictions(predictions) -> str:
+    """Plain-text lines for answering without the prediction agent."""
+    lines = []
+    for key in ("players", "teams"):
+        for p in predictions.get(key) or []:
+            name = p.get("player") or p["team"].title()
+            against = f" vs {p['opponent'].title()}" if p.get("opponent") else ""
+            stats = ", ".join(
+                f"{s.replace('_', ' ')} {v} ({p['interval'][s][0]}–{p['interval'][s][1]})"
+                for s, v in p["predicted_stats"].items()
+            )
+            lines.append(f"- {name}{against}: {stats}; confidence {p['confidence']:.0%}")
+    for m in predictions.get("matchups") or []:
+        lines.append(
+            f"- {m['team'].title()} {m['predicted_score'][m['team']]} – "
+            f"{m['opponent'].title()} {m['predicted_score'][m['opponent']]}; "
+            f"{m['team'].title()} win probability {m['win_probability']:.0%}"
+        )
+    return "\n".join(lines)
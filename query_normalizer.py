@@ -0,0 +1,359 @@
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from datetime import date
+
+from cache_utils import normalize_query
+
+# Nicknames and short forms -> canonical player names
+PLAYER_ALIASES = {
+    "lebron james": ("lebron", "bron", "king james", "lbj"),
+    "stephen curry": ("steph", "steph curry", "curry", "chef curry"),
+    "kevin durant": ("kd", "durant", "durantula"),
+    "giannis antetokounmpo": ("giannis", "greek freak", "antetokounmpo"),
+    "nikola jokic": ("jokic", "joker", "jokić", "nikola jokić"),
+    "luka doncic": ("luka", "doncic", "dončić", "luka dončić"),
+    "joel embiid": ("embiid", "jojo"),
+    "jayson tatum": ("tatum", "jt"),
+    "shai gilgeous-alexander": ("sga", "shai", "gilgeous-alexander", "shai gilgeous alexander"),
+    "victor wembanyama": ("wemby", "wembanyama"),
+    "anthony edwards": ("ant-man", "anthony edwards"),
+    "anthony davis": ("the brow",),
+    "damian lillard": ("dame", "lillard", "dame time"),
+    "james harden": ("harden", "the beard"),
+    "kawhi leonard": ("kawhi", "the klaw"),
+    "jimmy butler": ("jimmy buckets", "butler"),
+    "chris paul": ("cp3",),
+    "russell westbrook": ("westbrook", "russ"),
+    "kyrie irving": ("kyrie", "uncle drew"),
+    "devin booker": ("booker", "d book"),
+    "ja morant": ("ja", "morant"),
+    "donovan mitchell": ("spida", "spida mitchell"),
+    "tyrese haliburton": ("haliburton", "hali"),
+    "michael jordan": ("mj", "air jordan"),
+    "kobe bryant": ("kobe", "black mamba", "mamba"),
+    "shaquille oneal": ("shaq", "shaquille o neal", "shaquille o'neal"),
+    "tim duncan": ("duncan", "big fundamental"),
+    "kareem abdul-jabbar": ("kareem", "abdul-jabbar"),
+    "magic johnson": ("magic johnson",),
+    "larry bird": ("larry legend",),
+    "dirk nowitzki": ("dirk", "nowitzki"),
+    "klay thompson": ("klay",),
+    "draymond green": ("draymond",),
+}
+
+# Nicknames, cities and abbreviations -> canonical team names
+TEAM_ALIASES = {
+    "atlanta hawks": ("hawks", "atl"),
+    "boston celtics": ("celtics", "celts", "bos"),
+    "brooklyn nets": ("nets", "bkn"),
+    "charlotte hornets": ("hornets", "cha"),
+    "chicago bulls": ("bulls", "chi"),
+    "cleveland cavaliers": ("cavaliers", "cavs", "cle"),
+    "dallas mavericks": ("mavericks", "mavs", "dal"),
+    "denver nuggets": ("nuggets",),
+    "detroit pistons": ("pistons", "det"),
+    "golden state warriors": ("warriors", "dubs", "gsw", "golden state"),
+    "houston rockets": ("rockets", "hou"),
+    "indiana pacers": ("pacers", "ind"),
+    "los angeles clippers": ("clippers", "clips", "lac", "la clippers"),
+    "los angeles lakers": ("lakers", "lal", "la lakers"),
+    "memphis grizzlies": ("grizzlies", "grizz", "mem"),
+    "miami heat": ("heat", "mia"),
+    "milwaukee bucks": ("bucks",),
+    "minnesota timberwolves": ("timberwolves", "wolves"),
+    "new orleans pelicans": ("pelicans", "pels", "nop"),
+    "new york knicks": ("knicks", "nyk"),
+    "oklahoma city thunder": ("thunder", "okc"),
+    "orlando magic": ("magic", "orl"),
+    "philadelphia 76ers": ("76ers", "sixers", "phi", "philly"),
+    "phoenix suns": ("suns", "phx"),
+    "portland trail blazers": ("trail blazers", "blazers", "por"),
+    "sacramento kings": ("kings",),
+    "san antonio spurs": ("spurs", "sas"),
+    "toronto raptors": ("raptors", "raps", "tor"),
+    "utah jazz": ("jazz", "uta"),
+    "washington wizards": ("wizards", "wiz"),
+}
+
+# Stat shorthand -> canonical stat names (see stats_store.STAT_SYNONYMS)
+STAT_ALIASES = {
+    "points": ("pts", "ppg", "point", "scoring", "buckets", "points per game"),
+    "rebounds": ("reb", "rebs", "rpg", "boards", "rebound", "rebounds per game"),
+    "assists": ("ast", "apg", "dimes", "assist", "assists per game"),
+    "steals": ("stl", "spg", "steal"),
+    "blocks": ("blk", "bpg", "block", "swats"),
+    "three pointers": (
+        "3s", "threes", "3pt", "3pm", "3ptm", "triples", "three pointer",
+        "three-pointers", "three-pointer", "3-pointers", "3 pointers",
+    ),
+    "three point percentage": ("3p%", "3pt%", "3p pct", "three point %", "3 point percentage"),
+    "field goal percentage": ("fg%", "fg pct", "field goal %", "shooting percentage"),
+    "free throw percentage": ("ft%", "ft pct", "free throw %"),
+    "turnovers": ("tov", "turnover"),
+    "minutes": ("mpg", "min", "mins", "min played", "minutes played"),
+    "triple doubles": ("triple-doubles", "triple double", "trip dubs"),
+}
+
+# Short aliases that are also common words ("min", "den", "ad", "ant") are
+# deliberately left out of the tables above. Abbreviations among them are only
+# resolved in fields known to hold a team (e.g. a game log's opponent).
+TEAM_ABBREVIATIONS = {
+    "den": "denver nuggets", "mil": "milwaukee bucks", "min": "minnesota timberwolves",
+    "sac": "sacramento kings", "was": "washington wizards",
+}
+
+# Aliases that imply a per-game average; they add the "average" qualifier so
+# "career points per game" never shares a key with "career points"
+PER_GAME_ALIASES = {
+    "ppg", "rpg", "apg", "spg", "bpg", "mpg",
+    "points per game", "rebounds per game", "assists per game",
+}
+PER_GAME_RE = re.compile(r"\b(?:per|a) game\b")
+
+# Filler words dropped from the canonical form
+STOPWORDS = {
+    "a", "an", "the", "what", "whats", "what's", "is", "are", "was", "were", "how", "many",
+    "much", "did", "does", "do", "has", "have", "had", "of", "for", "in", "on", "at", "by",
+    "me", "show", "tell", "give", "about", "please", "can", "you", "i", "want", "to", "know",
+    "s", "his", "her", "their", "get", "got", "so", "far", "with", "and",
+}
+
+# Words that change the answer even when entities, seasons and stats match;
+# part of the QueryIndex bucket signature, never fuzzily matched
+QUALIFIERS = {
+    "career": "career", "playoffs": "playoffs", "playoff": "playoffs", "postseason": "playoffs",
+    "finals": "finals", "regular": "regular", "total": "total", "totals": "total",
+    "average": "average", "averages": "average", "avg": "average", "averaging": "average",
+    "high": "high", "highs": "high", "record": "record", "records": "record",
+    "last": "last", "first": "first", "next": "next", "rookie": "rookie",
+    "all-time": "all-time", "alltime": "all-time", "ever": "all-time",
+    "game": "game", "games": "game", "month": "month", "week": "week",
+    "home": "home", "road": "away", "away": "away", "vs": "vs", "versus": "vs", "against": "vs",
+    "compare": "vs", "compared": "vs", "comparison": "vs",
+    "leaders": "leaders", "leader": "leaders", "leads": "leaders", "most": "most",
+    "best": "best", "worst": "worst", "top": "top", "fewest": "fewest", "least": "fewest",
+}
+
+SEASON_RE = re.compile(r"\b((?:19|20)\d{2})\s*[-/]\s*(?:19|20)?(\d{2})\b")
+SEASON_PHRASES = {
+    "this season": 0, "this year": 0, "current season": 0, "this szn": 0,
+    "last season": -1, "last year": -1, "previous season": -1,
+}
+
+
+def current_season(today=None) -> str:
+    """NBA season label for a date, e.g. 2026-10-18 -> '2026-27'."""
+    today = today or date.today()
+    start = today.year if today.month >= 10 else today.year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+
+def _season_offset(offset, today=None) -> str:
+    start = int(current_season(today)[:4]) + offset
+    return f"{start}-{(start + 1) % 100:02d}"
+
+
+def _build_aliases():
+    """alias -> (kind, canonical); canonical names map to themselves."""
+    aliases = {}
+    for kind, table in (("stat", STAT_ALIASES), ("team", TEAM_ALIASES), ("player", PLAYER_ALIASES)):
+        for canonical, names in table.items():
+            for name in (canonical,) + names:
+                aliases[normalize_query(name)] = (kind, canonical)
+    return aliases
+
+
+ALIASES = _build_aliases()
+# Words that may precede a bare surname alias ("is curry ..."); any other word
+# there is taken as an unknown first name ("seth curry" is not Stephen Curry)
+CONTEXT_WORDS = (
+    STOPWORDS | set(QUALIFIERS) | {w for alias in ALIASES for w in alias.split()}
+    | {"than", "or", "then", "who", "did", "score", "scored", "stats", "career"}
+)
+# Longest alternatives first so "magic johnson" wins over "magic"
+ALIAS_RE = re.compile(
+    r"(?<![\w%])(" + "|".join(re.escape(a) for a in sorted(ALIASES, key=len, reverse=True)) + r")(?![\w%])"
+)
+
+
+def parse_query(query, today=None) -> dict:
+    """Canonical form of a query plus the players, teams, seasons and stats it mentions.
+
+    ``"Steph 3s this year"`` -> ``{"canonical": "stephen curry three pointers 2026-27", ...}``
+    """
+    q = normalize_query(query)
+    seasons = []
+
+    def season(match):
+        seasons.append(f"{match.group(1)}-{match.group(2)}")
+        return f" {seasons[-1]} "
+
+    q = SEASON_RE.sub(season, q)
+    for phrase, offset in SEASON_PHRASES.items():
+        if phrase in q:
+            seasons.append(_season_offset(offset, today))
+            q = q.replace(phrase, f" {seasons[-1]} ")
+
+    found = {"player": [], "team": [], "stat": []}
+
+    def alias(match):
+        name = match.group(1)
+        kind, canonical = ALIASES[name]
+        if kind == "player" and name != canonical and name in canonical.split():
+            before = q[:match.start()].split()
+            if before and before[-1] not in CONTEXT_WORDS and not re.fullmatch(r"[\d.%-]+", before[-1]):
+                return name  # Surname after an unknown first name: someone else
+        if canonical not in found[kind]:
+            found[kind].append(canonical)
+        if name in PER_GAME_ALIASES:
+            return f" {canonical} average "
+        return f" {canonical} "
+
+    q = ALIAS_RE.sub(alias, q)
+    q = PER_GAME_RE.sub(" average ", q)
+    words = [w for w in q.split() if w not in STOPWORDS]
+    named = {w for name in found["player"] + found["team"] + found["stat"] for w in name.split()}
+    return {
+        "canonical": " ".join(words),
+        "players": found["player"],
+        "teams": found["team"],
+        "seasons": list(dict.fromkeys(seasons)),
+        "stats": found["stat"],
+        "numbers": [w for w in words if w.isdigit()],
+        "qualifiers": sorted({QUALIFIERS[w] for w in words if w in QUALIFIERS}),
+        # Remaining content words ("wins", "salary", "allowed", "offensive"), plurals folded
+        "terms": sorted({
+            w[:-1] if len(w) > 3 and w.endswith("s") else w
+            for w in words
+            if w not in named and w not in QUALIFIERS and w not in seasons and not w.isdigit()
+        }),
+    }
+
+
+def canonicalize_query(query, today=None) -> str:
+    return parse_query(query, today)["canonical"]
+
+
+def _trigrams(text) -> Counter:
+    # Word order rarely changes the question once the signature matches
+    padded = f"  {' '.join(sorted(text.split()))} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a, b) -> float:
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class QueryIndex:
+    """Maps paraphrases of earlier queries onto their cache key.
+
+    Queries are bucketed by what they ask about (players, teams, seasons,
+    stats, numbers, QUALIFIERS and the remaining content words must match
+    exactly, so a long name can't hide "wins" vs "losses"), and within a
+    bucket the closest previous canonical query by character-trigram cosine
+    is reused when it scores at least ``threshold``. So "Steph 3s this year" can share cached
+    results with "Curry three pointers 2026-27", but never with 2025-26.
+
+    With ``shared`` (a shared_state.SharedKV), buckets are also published to
+    other worker processes, so a paraphrase maps to the same key whichever
+    worker first saw the query.
+    """
+
+    def __init__(self, threshold=0.8, max_entries=5000, shared=None, shared_bucket_size=50, shared_ttl_seconds=24 * 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.shared = shared
+        self.shared_bucket_size = shared_bucket_size
+        self.shared_ttl_seconds = shared_ttl_seconds
+        self._buckets = {}  # signature -> {canonical: trigrams}
+        self._order = OrderedDict()  # (signature, canonical), for LRU eviction
+        self._lock = threading.Lock()
+        self.exact = 0
+        self.near = 0
+        self.new = 0
+
+    def cache_key(self, query) -> str:
+        """Key to cache ``query`` under: an earlier equivalent query's, or its own canonical form."""
+        parsed = parse_query(query)
+        canonical = parsed["canonical"] or normalize_query(query)
+        signature = tuple(
+            tuple(sorted(parsed[k]))
+            for k in ("players", "teams", "seasons", "stats", "numbers", "qualifiers", "terms")
+        )
+        with self._lock:
+            match = self._match(signature, canonical)
+            if match is not None:
+                return match
+        if self.shared is None:
+            with self._lock:
+                return self._insert(signature, canonical)
+
+        # Not seen in this worker: pick up what the others have, then publish
+        shared_key = json.dumps(signature)
+        published = self.shared.get("query_index", shared_key, [])
+        with self._lock:
+            for other in published:
+                self._add(signature, other)
+            match = self._match(signature, canonical)
+            if match is not None:
+                return match
+            key = self._insert(signature, canonical)
+            prune = self.new % 64 == 0
+        published = (published + [key])[-self.shared_bucket_size:]
+        self.shared.set("query_index", shared_key, published, self.shared_ttl_seconds)
+        if prune:
+            self.shared.prune("query_index", self.max_entries)
+        return key
+
+    def _match(self, signature, canonical):
+        """Earlier equivalent key in the bucket, or None; caller holds the lock."""
+        bucket = self._buckets.get(signature, {})
+        if canonical in bucket:
+            self.exact += 1
+            self._order.move_to_end((signature, canonical))
+            return canonical
+
+        grams = _trigrams(canonical)
+        best, best_score = None, 0.0
+        for other, other_grams in bucket.items():
+            score = _cosine(grams, other_grams)
+            if score > best_score:
+                best, best_score = other, score
+        if best is not None and best_score >= self.threshold:
+            self.near += 1
+            self._order.move_to_end((signature, best))
+            return best
+        return None
+
+    def _insert(self, signature, canonical):
+        self.new += 1
+        self._add(signature, canonical)
+        return canonical
+
+    def _add(self, signature, canonical):
+        bucket = self._buckets.setdefault(signature, {})
+        if canonical in bucket:
+            return
+        bucket[canonical] = _trigrams(canonical)
+        self._order[(signature, canonical)] = None
+        while len(self._order) > self.max_entries:
+            (old_signature, old), _ = self._order.popitem(last=False)
+            self._buckets[old_signature].pop(old, None)
+            if not self._buckets[old_signature]:
+                del self._buckets[old_signature]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact + self.near + self.new
+            return {
+                "size": len(self._order),
+                "exact": self.exact,
+                "near_duplicate": self.near,
+                "new": self.new,
+                "reuse_rate": round((self.exact + self.near) / lookups, 4) if lookups else 0.0,
+            }
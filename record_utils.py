@@ -0,0 +1,109 @@
+import json
+import re
+
+ENTITY_KEYS = ("player", "team", "name")
+GAME_KEYS = ("date", "game_date", "opponent", "opp", "game_id")
+
+
+def _json_candidates(raw: str):
+    """Yield substrings of agent output that may hold a JSON document."""
+    for block in re.findall(r"```(?:json)?\s*(.*?)\s*```", raw, re.DOTALL):
+        yield block
+    for open_char, close_char in (("[", "]"), ("{", "}")):
+        start, end = raw.find(open_char), raw.rfind(close_char)
+        if start != -1 and end > start:
+            yield raw[start:end + 1]
+
+
+def _loads_lenient(text: str):
+    """json.loads, retrying with JS-style single quotes and bare keys fixed."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    fixed = re.sub(r"'([^'\n]*)'", r'"\1"', text)
+    fixed = re.sub(r'([{,]\s*)([A-Za-z_][\w%]*)\s*:', r'\1"\2":', fixed)
+    try:
+        return json.loads(fixed)
+    except json.JSONDecodeError:
+        return None
+
+
+def to_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*%?\s*", value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _as_record_list(parsed):
+    if isinstance(parsed, list):
+        return [r for r in parsed if isinstance(r, dict)]
+    if isinstance(parsed, dict):
+        if any(k in parsed for k in ENTITY_KEYS):
+            return [parsed]
+        for value in parsed.values():
+            if isinstance(value, list) and value and all(isinstance(r, dict) for r in value):
+                return value
+    return []
+
+
+def extract_rows(raw):
+    """The list of row dicts in data-agent output (parsed JSON), or []."""
+    if isinstance(raw, (list, dict)):
+        return _as_record_list(raw)
+    for text in _json_candidates(str(raw or "")):
+        rows = _as_record_list(_loads_lenient(text))
+        if rows:
+            return rows
+    return []
+
+
+def is_game_row(row) -> bool:
+    """Rows with a date or opponent are single games, not season/career lines."""
+    return any(stat_key(k) in GAME_KEYS for k in row)
+
+
+def extract_records(raw, per_game=True):
+    """Pull player/team stat records out of data-agent output.
+
+    Returns a list of ``{"entity", "entity_type", "season", "stats"}`` dicts;
+    records without an entity name or any numeric stat are dropped, as are
+    single-game rows unless ``per_game`` is set.
+    """
+    records = []
+    for item in extract_rows(raw):
+        if not per_game and is_game_row(item):
+            continue
+        entity_type = next((k for k in ENTITY_KEYS if isinstance(item.get(k), str)), None)
+        if entity_type is None:
+            continue
+        stats = {}
+        for key, value in item.items():
+            number = to_number(value)
+            if key not in ENTITY_KEYS and key != "season" and number is not None:
+                stats[stat_key(key)] = number
+        if not stats:
+            continue
+        season = item.get("season")
+        records.append(
+            {
+                "entity": item[entity_type].strip(),
+                "entity_type": "team" if entity_type == "team" else "player",
+                "season": str(season).strip().lower() if season not in (None, "") else "",
+                "stats": stats,
+            }
+        )
+    return records
+
+
+def stat_key(name: str) -> str:
+    """Canonical column name for a stat: 'FG%' -> 'fg_pct', 'Points' -> 'points'."""
+    key = name.strip().lower().replace("%", "_pct")
+    return re.sub(r"[^a-z0-9]+", "_", key).strip("_")
+
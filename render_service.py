@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from config import RENDER_CONFIG, VIZ_CONFIG
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when max_pending renders are already queued."""
+
+
+def _warm_worker():
+    """Process initializer: import matplotlib and draw once so fonts are cached."""
+    from vizualization_utils import generate_chart_from_json
+
+    generate_chart_from_json({"title": "warmup", "type": "bar", "labels": ["a"], "x": [1]}, raw=True)
+
+
+def _render_png(spec):
+    from vizualization_utils import generate_chart_from_json
+
+    return generate_chart_from_json(spec, raw=True)
+
+
+class RenderService:
+    """Renders chart specs to PNG bytes away from the request path.
+
+    With ``use_processes`` the work runs in a ProcessPoolExecutor of warm,
+    matplotlib-loaded workers, so rendering never holds the server's GIL;
+    otherwise in a thread pool. At most ``max_pending`` renders are queued and
+    each waits up to ``timeout_seconds`` before the chart is skipped.
+    """
+
+    def __init__(
+        self,
+        use_processes=RENDER_CONFIG["use_processes"],
+        workers=RENDER_CONFIG["workers"],
+        max_pending=RENDER_CONFIG["max_pending"],
+        timeout_seconds=RENDER_CONFIG["timeout_seconds"],
+    ):
+        self.use_processes = use_processes
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the pool and warm every worker; safe to call more than once."""
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        # spawn: forking a threaded server process is unsafe
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_warm_worker,
+                    )
+                    for _ in range(self.workers):
+                        self._executor.submit(int)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=VIZ_CONFIG["render_threads"], thread_name_prefix="nba-chart"
+                    )
+        return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _submit(self, spec):
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull("Chart render queue is full")
+        try:
+            future = self.start().submit(_render_png, spec)
+        except BrokenProcessPool:
+            self._slots.release()
+            self.shutdown()  # A crashed worker poisons the pool; rebuild on next call
+            raise
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render(self, spec):
+        """Blocking render; PNG bytes, or None on timeout."""
+        future = self._submit(spec)
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except TimeoutError:
+            future.cancel()
+            print("⚠️ Chart render timed out")
+            return None
+
+    async def arender(self, spec):
+        """Awaitable render; PNG bytes, or None on timeout."""
+        future = self._submit(spec)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            future.cancel()
+            print("⚠️ Chart render timed out")
+            return None
+
+
+render_service = RenderService()
@@ -0,0 +1,38 @@
+# serve.py
+"""Production launcher for the FastAPI server (server.py).
+
+    python serve.py --workers 4
+
+Runs uvicorn with one process per worker. With more than one worker the
+response caches, conversation history, query index and live scores are kept
+in a SQLite file all workers share (DEPLOYMENT_CONFIG['shared_state_path']),
+so a follow-up question or a repeated query hits the same state whichever
+worker receives it. Singleflight, /metrics and the chart render pool stay
+per worker.
+"""
+import argparse
+import os
+
+import uvicorn
+
+from config import DEPLOYMENT_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the NBA stats chatbot API")
+    parser.add_argument("--host", default=DEPLOYMENT_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=DEPLOYMENT_CONFIG["port"])
+    parser.add_argument("--workers", type=int, default=DEPLOYMENT_CONFIG["workers"])
+    args = parser.parse_args()
+
+    # Workers re-import config, so settings travel through the environment
+    os.environ["NBA_WORKERS"] = str(args.workers)
+    if args.workers > 1:
+        os.environ["NBA_SHARED_STATE"] = "1"
+
+    print(f"🏀 Serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 # server.py
-from fastapi import FastAPI, Request
+import asyncio
+import json
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from main import NBAStatsChatbot
+from history_store import DEFAULT_SESSION
+from metrics import configure_logging
+from config import BATCH_CONFIG
 
 app = FastAPI(title="NBA Stats Chatbot Bridge")
 
@@ -15,8 +21,29 @@ app.add_middleware(
 )
 
 # Initialize chatbot once (keeps your logic as-is)
+configure_logging()
 chatbot = NBAStatsChatbot()
 
+
+@app.on_event("startup")
+def start_render_workers():
+    # Spawn and warm the chart render processes before the first chart request
+    chatbot.render_service.start()
+
+
+@app.on_event("startup")
+async def start_live_refresher():
+    # Polls on uvicorn's loop; score queries are then answered from the index
+    if chatbot.live_refresher is not None:
+        chatbot.live_refresher.start()
+
+
+@app.on_event("shutdown")
+def stop_render_workers():
+    chatbot.render_service.shutdown()
+    if chatbot.live_refresher is not None:
+        chatbot.live_refresher.stop()
+
 @app.post("/chat")
 async def chat(request: Request):
     data = await request.json()
@@ -24,10 +51,86 @@ async def chat(request: Request):
     if not user_message:
         return {"reply": "Please provide a message."}
 
-    # This calls your existing process_query() method (no modification)
-    result = chatbot.process_query(user_message)
+    # Awaits the pipeline on uvicorn's loop so other chats keep being served
+    session_id = data.get("session_id") or DEFAULT_SESSION
+    result = await chatbot.aprocess_query(user_message, session_id)
 
     # result is the dict your code returns. Return the parts the frontend needs.
     reply = result.get("answer", "No answer generated.")
-    # If you later want visualization, result.get("visualization") exists but may be a PIL image object.
-    return {"reply": reply}
+    # Charts are referenced by URL (see /charts/<id>.png), never inlined
+    return {
+        "reply": reply,
+        "has_visualization": bool(result.get("visualization")),
+        "chart_url": result.get("visualization"),
+        "chart_title": result.get("chart_title", ""),
+    }
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: Request):
+    """Answer a list of related queries with shared searches and data extraction."""
+    data = await request.json()
+    queries = [q.strip() for q in data.get("queries", []) if isinstance(q, str) and q.strip()]
+    if not queries:
+        raise HTTPException(status_code=400, detail="Provide a non-empty 'queries' list.")
+    if len(queries) > BATCH_CONFIG["max_queries"]:
+        raise HTTPException(
+            status_code=400, detail=f"At most {BATCH_CONFIG['max_queries']} queries per batch."
+        )
+
+    session_id = data.get("session_id") or DEFAULT_SESSION
+    results = await chatbot.abatch_process(queries, session_id)
+    return {
+        "results": [
+            {
+                "query": result["query"],
+                "reply": result.get("answer", "No answer generated."),
+                "has_visualization": bool(result.get("visualization")),
+                "chart_url": result.get("visualization"),
+                "chart_title": result.get("chart_title", ""),
+            }
+            for result in results
+        ]
+    }
+
+
+@app.get("/charts/{chart_id}.png")
+async def chart_image(chart_id: str, request: Request):
+    etag = f'"{chart_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    png = chatbot.chart_store.get(chart_id)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Chart not found")
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Per-stage latency histograms, token usage/cost and cache statistics."""
+    # Cache and history sizes are SQLite queries when state is shared across workers
+    return await asyncio.to_thread(chatbot.metrics_snapshot)
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """Server-sent events: search, data, chart, token (orchestrator deltas), done."""
+    data = await request.json()
+    user_message = data.get("message", "").strip()
+    if not user_message:
+        return {"reply": "Please provide a message."}
+
+    session_id = data.get("session_id") or DEFAULT_SESSION
+
+    async def event_source():
+        async for event in chatbot.astream_query(user_message, session_id):
+            payload = json.dumps(event["data"], default=str)
+            yield f"event: {event['event']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
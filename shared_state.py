@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache_utils import TTLCache
+
+PRUNE_EVERY = 64  # Writes between size/expiry sweeps of a namespace
+
+
+class SharedKV:
+    """Namespaced key -> JSON value store in one SQLite file, shared by worker processes.
+
+    The file runs in WAL mode, so readers in one worker never block on a write
+    in another. Connections are opened per thread and per process, because a
+    SQLite connection must not be used across a fork.
+    """
+
+    def __init__(self, path, busy_timeout_seconds=5):
+        self.path = path
+        self.busy_timeout_seconds = busy_timeout_seconds
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        db = self.connection()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL, updated_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_kv_updated ON kv (namespace, updated_at)")
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (autocommit), reopened after a fork."""
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def get(self, namespace, key, default=None):
+        entry = self.entry(namespace, key)
+        return entry[0] if entry is not None else default
+
+    def entry(self, namespace, key):
+        """(value, expires_at) for a live entry, or None."""
+        row = self.connection().execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at >= ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, namespace, key, value, ttl_seconds=None):
+        now = time.time()
+        self.connection().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, default=str), now + ttl_seconds if ttl_seconds else None, now),
+        )
+
+    def delete(self, namespace, key):
+        self.connection().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace):
+        self.connection().execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+
+    def count(self, namespace) -> int:
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM kv WHERE namespace = ?", (namespace,)
+        ).fetchone()[0]
+
+    def prune(self, namespace, max_entries) -> int:
+        """Drop expired entries, then the least recently written beyond ``max_entries``."""
+        db = self.connection()
+        removed = db.execute(
+            "DELETE FROM kv WHERE namespace = ? AND expires_at < ?", (namespace, time.time())
+        ).rowcount
+        removed += db.execute(
+            "DELETE FROM kv WHERE namespace = ? AND key IN ("
+            "SELECT key FROM kv WHERE namespace = ? ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (namespace, namespace, max_entries),
+        ).rowcount
+        return removed
+
+    def acquire_lease(self, name, owner, ttl_seconds) -> bool:
+        """Take or renew a lease held by at most one ``owner`` at a time.
+
+        Succeeds when the lease is free, expired or already ours; the holder
+        must renew it within ``ttl_seconds`` or another worker takes over.
+        """
+        now = time.time()
+        cursor = self.connection().execute(
+            "INSERT INTO kv (namespace, key, value, expires_at, updated_at) VALUES ('lease', ?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, updated_at = excluded.updated_at "
+            "WHERE kv.value = excluded.value OR kv.expires_at < ?",
+            (name, json.dumps(owner), now + ttl_seconds, now, now),
+        )
+        return cursor.rowcount == 1
+
+
+class SharedTTLCache:
+    """TTLCache interface backed by a SharedKV namespace.
+
+    A small per-process TTLCache sits in front, so repeated hits in one
+    worker skip SQLite; entries written by any worker are visible to all.
+    clear() empties the shared namespace but not other workers' local copies.
+    """
+
+    def __init__(self, kv, namespace, max_entries=512, ttl_seconds=24 * 3600, local_entries=128):
+        self.kv = kv
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.local = TTLCache(min(local_entries, max_entries), ttl_seconds)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is None:
+            entry = self.kv.entry(self.namespace, key)
+            if entry is not None:
+                value, expires_at = entry
+                # The local copy must not outlive the shared one (short-TTL live answers)
+                ttl = expires_at - time.time() if expires_at is not None else None
+                self.local.set(key, value, ttl)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.kv.set(self.namespace, key, value, ttl)
+        self.local.set(key, value, ttl)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            removed = self.kv.prune(self.namespace, self.max_entries)
+            with self._lock:
+                self.evictions += removed
+
+    def clear(self):
+        self.kv.clear(self.namespace)
+        self.local.clear()
+
+    def __len__(self):
+        return self.kv.count(self.namespace)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "local_hits": self.local.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "backend": "sqlite",
+        }
@@ -4,6 +4,21 @@ import { ChatInput } from "@/components/ChatInput";
 import { TypingIndicator } from "@/components/TypingIndicator";
 import { BasketballLogo } from "@/components/BasketballLogo";
 
+const API_BASE = "http://127.0.0.1:8000";
+const SESSION_KEY = "nba-chat-session-id";
+
+// One conversation per browser tab, so the backend keeps separate history per user
+const getSessionId = (): string => {
+  let id = sessionStorage.getItem(SESSION_KEY);
+  if (!id) {
+    id = typeof crypto !== "undefined" && "randomUUID" in crypto
+      ? crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    sessionStorage.setItem(SESSION_KEY, id);
+  }
+  return id;
+};
+
 interface Message {
   id: string;
   role: "user" | "assistant";
@@ -16,6 +31,7 @@ const Index = () => {
   const [messages, setMessages] = useState<Message[]>([]);
   const [isTyping, setIsTyping] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const sessionId = useRef<string>(getSessionId());
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -36,10 +52,10 @@ const Index = () => {
     setIsTyping(true);
 
     try {
-      const response = await fetch("http://127.0.0.1:8000/chat", {
+      const response = await fetch(`${API_BASE}/chat`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ message: content }),
+        body: JSON.stringify({ message: content, session_id: sessionId.current }),
       });
 
       if (!response.ok) throw new Error(`HTTP ${response.status}`);
@@ -50,7 +66,7 @@ const Index = () => {
         id: (Date.now() + 1).toString(),
         role: "assistant",
         content: data.reply || "No reply received.",
-        chartImage: data.chart_image || null,
+        chartImage: data.chart_url ? `${API_BASE}${data.chart_url}` : data.chart_image || null,
         chartTitle: data.chart_title || null,
       };
 
@@ -97,7 +113,8 @@ const Index = () => {
                     )}
                     <img
                       src={
-                        message.chartImage.startsWith("data:image")
+                        message.chartImage.startsWith("data:image") ||
+                        message.chartImage.startsWith("http")
                           ? message.chartImage
                           : `data:image/png;base64,${message.chartImage}`
                       }
@@ -0,0 +1,240 @@
+import os
+import sqlite3
+import threading
+import time
+
+from cache_utils import is_time_sensitive, normalize_query
+from query_normalizer import QUALIFIERS, STOPWORDS, current_season, parse_query
+from record_utils import extract_records
+
+# Canonical stat names (query_normalizer.STAT_ALIASES) and a few plain query
+# words -> stored stat columns that answer them
+STAT_SYNONYMS = {
+    "points": ("points", "pts", "ppg", "total_points", "career_points"),
+    "rebounds": ("rebounds", "reb", "rpg", "total_rebounds", "trb"),
+    "assists": ("assists", "ast", "apg", "total_assists"),
+    "steals": ("steals", "stl", "spg"),
+    "blocks": ("blocks", "blk", "bpg"),
+    "three pointers": ("3pm", "3p", "threes", "three_pointers", "3pt", "3ptm", "fg3m"),
+    "three point percentage": ("3p_pct", "three_point_pct", "3pt_pct", "fg3_pct"),
+    "field goal percentage": ("fg_pct", "field_goal_pct"),
+    "free throw percentage": ("ft_pct", "free_throw_pct"),
+    "shooting": ("fg_pct", "field_goal_pct", "ts_pct", "efg_pct", "3p_pct"),
+    "turnovers": ("turnovers", "tov"),
+    "minutes": ("minutes", "min", "mpg"),
+    "triple doubles": ("triple_doubles",),
+    "games": ("games", "gp", "games_played"),
+    "wins": ("wins", "w"),
+}
+STAT_WORDS = {
+    "shooting": "shooting", "efficiency": "shooting",
+    "gp": "games", "wins": "wins",
+}
+# Stored rows are regular-season (or career) lines with no split; any other
+# qualifier (playoffs, finals, highs, last N games, ...) needs the agents
+ANSWERABLE_QUALIFIERS = {"career", "regular", "average", "total", "vs"}
+# Data fetched for other questions (playoffs, last 10 games, vs a team, ...)
+# holds split numbers and is never stored as a season line
+INGESTABLE_QUALIFIERS = {"career", "regular", "average", "total"}
+# Words a stored-stats question may contain besides names, stats and seasons
+GENERIC_WORDS = {"stats", "stat", "statistics", "numbers", "season", "line", "regular", "put", "up"}
+
+
+def _is_total_column(column) -> bool:
+    return column.startswith(("total_", "career_"))
+
+
+class StatsStore:
+    """SQLite store of previously extracted stats, indexed by entity and season.
+
+    Rows are (entity, season, stat, value). lookup() answers a query only when
+    every entity, season and stat it mentions is already stored; otherwise it
+    returns None and the pipeline falls back to the search + data agents.
+    """
+
+    def __init__(self, path=":memory:", current_season_max_age_hours=12):
+        self.current_season_max_age = current_season_max_age_hours * 3600
+        self._lock = threading.Lock()
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        if path != ":memory:":
+            # Several worker processes may read and ingest into the same file
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS stats ("
+            "entity_key TEXT NOT NULL, entity TEXT NOT NULL, entity_type TEXT NOT NULL, "
+            "season TEXT NOT NULL, stat TEXT NOT NULL, value REAL NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (entity_key, season, stat))"
+        )
+        self._db.commit()
+        self._name_index = {}
+        self._refresh_name_index()
+
+    def _refresh_name_index(self):
+        """Set of stored entity keys (normalized full names)."""
+        rows = self._db.execute("SELECT DISTINCT entity_key FROM stats").fetchall()
+        self._name_index = {key for (key,) in rows}
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sync_name_index(self):
+        """Rebuild the name index after another process wrote to the file."""
+        with self._lock:
+            if self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+                self._refresh_name_index()
+
+    def ingest(self, structured_data, query=None) -> int:
+        """Upsert records parsed from data-agent output; returns rows written.
+
+        ``query`` is the question the data was extracted for; data for split
+        questions (see INGESTABLE_QUALIFIERS) or time-relative ones is skipped.
+        """
+        if query is not None:
+            parsed = parse_query(query)
+            if is_time_sensitive(query) or set(parsed["qualifiers"]) - INGESTABLE_QUALIFIERS or parsed["numbers"]:
+                return 0
+        # Single-game rows (game logs) would overwrite season numbers
+        records = extract_records(structured_data, per_game=False)
+        now = time.time()
+        rows = [
+            (normalize_query(r["entity"]), r["entity"], r["entity_type"], r["season"], stat, value, now)
+            for r in records
+            for stat, value in r["stats"].items()
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO stats "
+                "(entity_key, entity, entity_type, season, stat, value, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            self._refresh_name_index()
+        return len(rows)
+
+    def lookup(self, query, allow_stale=False):
+        """Stored records fully answering ``query``, or None.
+
+        Every player or team the query names must resolve to exactly one
+        stored entity, every stat to a stored column, and every qualifier to
+        something the stored season lines can answer; any other word in the
+        query (an unknown name, an unmapped stat) also means None.
+
+        ``allow_stale`` skips the current-season age check; used to degrade
+        gracefully when the model API is unavailable.
+        """
+        q = normalize_query(query)
+        if is_time_sensitive(q):  # Needs fresh web data, never a stored answer
+            return None
+        parsed = parse_query(q)
+        qualifiers = set(parsed["qualifiers"])
+        if qualifiers - ANSWERABLE_QUALIFIERS or len(parsed["seasons"]) > 1 or parsed["numbers"]:
+            return None
+
+        self._sync_name_index()
+        entities = self._resolve_entities(parsed)
+        if not entities or ("vs" in qualifiers and len(entities) < 2):
+            return None
+
+        if parsed["seasons"]:
+            season = parsed["seasons"][0]
+        elif "career" in qualifiers:
+            season = "career"
+        else:
+            season = None
+
+        wanted = set(parsed["stats"])
+        leftover = set(parsed["canonical"].split()) - set(parsed["seasons"])
+        for name in parsed["players"] + parsed["teams"] + parsed["stats"] + list(entities):
+            leftover -= set(name.split())
+        for word in leftover:
+            if word in STAT_WORDS:
+                wanted.add(STAT_WORDS[word])
+            elif word not in QUALIFIERS and word not in STOPWORDS and word not in GENERIC_WORDS:
+                return None  # Unknown name or stat; let the agents handle it
+        if any(stat not in STAT_SYNONYMS for stat in wanted):
+            return None
+        split = "total" if "total" in qualifiers else "average" if "average" in qualifiers else None
+
+        records = []
+        with self._lock:
+            for key in sorted(entities):
+                record = self._lookup_entity(key, season, wanted, split, allow_stale)
+                if record is None:
+                    return None
+                records.append(record)
+        if "vs" in qualifiers and len({"team" if "team" in r else "player" for r in records}) > 1:
+            return None  # "LeBron against the Celtics" is a matchup split, not two season lines
+        return records
+
+    def _resolve_entities(self, parsed):
+        """Stored keys for the names in a parsed query, or None if any is missing or ambiguous.
+
+        Known players/teams (query_normalizer aliases) resolve to the stored
+        key with the same name, or one whose words are a subset of it
+        ("lakers" for "los angeles lakers") or vice versa; a stored full name
+        appearing in the query counts as well. Partial names are never
+        matched on their own, so "james harden" can't pick up "lebron james".
+        """
+        entities = set()
+        canonical = f" {parsed['canonical']} "
+        for name in parsed["players"] + parsed["teams"]:
+            words = set(name.split())
+            matches = {
+                key for key in self._name_index
+                if key == name or set(key.split()) <= words or words <= set(key.split())
+            }
+            if len(matches) != 1:
+                return None
+            entities |= matches
+        for key in self._name_index:
+            if f" {key} " in canonical and not any(set(key.split()) <= set(e.split()) for e in entities):
+                entities.add(key)
+        return entities
+
+    def _lookup_entity(self, key, season, wanted, split=None, allow_stale=False):
+        rows = self._db.execute(
+            "SELECT entity, entity_type, season, stat, value, updated_at "
+            "FROM stats WHERE entity_key = ?",
+            (key,),
+        ).fetchall()
+        seasons = {row[2] for row in rows}
+        if season is None:
+            # No season named means "now": only a current-season (or undated)
+            # line may answer, and it goes through the freshness check below
+            season = next((s for s in (current_season(), "") if s in seasons), None)
+            if season is None:
+                return None
+
+        rows = [row for row in rows if row[2] == season]
+        if not rows:
+            return None
+        if not allow_stale and season in (current_season(), "career", ""):
+            oldest = min(row[5] for row in rows)
+            if time.time() - oldest > self.current_season_max_age:
+                return None  # Still changing; let the agents refresh it
+
+        stats = {row[3]: row[4] for row in rows}
+        for stat in wanted:
+            columns = [col for col in STAT_SYNONYMS[stat] if col in stats]
+            if split is not None:
+                # "career points" (total) and "points per game" (average) aren't interchangeable
+                columns = [col for col in columns if _is_total_column(col) == (split == "total")]
+            if not columns:
+                return None
+
+        entity, entity_type = rows[0][0], rows[0][1]
+        record = {entity_type: entity}
+        if season:
+            record["season"] = season
+        record.update(stats)
+        return record
+
+    def stats(self) -> dict:
+        with self._lock:
+            entities, rows = self._db.execute(
+                "SELECT COUNT(DISTINCT entity_key), COUNT(*) FROM stats"
+            ).fetchone()
+        return {"entities": entities, "rows": rows}
@@ -0,0 +1,31 @@
+import pytest
+
+from live_games import LiveGameIndex
+
+
+@pytest.fixture
+def index():
+    index = LiveGameIndex()
+    index.apply([
+        {"game_id": "1", "home": "Los Angeles Lakers", "home_abbr": "LAL", "away": "Boston Celtics", "away_abbr": "BOS"},
+        {"game_id": "2", "home": "Washington Wizards", "home_abbr": "WAS", "away": "Minnesota Timberwolves", "away_abbr": "MIN"},
+    ])
+    return index
+
+
+def _ids(games):
+    return [g["game_id"] for g in games or []]
+
+
+@pytest.mark.parametrize("query", ["what was the Lakers score", "Lakers score min by min", "den of lakers score"])
+def test_common_word_abbreviations_do_not_match(index, query):
+    assert _ids(index.lookup(query)) == ["1"]
+
+
+def test_uppercase_abbreviations_match(index):
+    assert _ids(index.lookup("WAS score")) == ["2"]
+    assert _ids(index.lookup("LAL vs BOS score")) == ["1"]
+
+
+def test_history_questions_are_not_live(index):
+    assert index.lookup("Lakers score in the 2016 season") is None
@@ -0,0 +1,114 @@
+import json
+import math
+
+import pytest
+
+from config import PREDICTION_CONFIG
+from prediction_engine import game_log_frame, is_prediction_query, predict, predict_matchup, project_entities
+
+
+def _frame(rows):
+    return game_log_frame(json.dumps(rows))
+
+
+def _player_log(points, opponents=None):
+    opponents = opponents or ["Knicks"] * len(points)
+    return [
+        {"player": "Jayson Tatum", "date": f"2026-01-{day + 1:02d}", "opponent": opp, "points": pts}
+        for day, (pts, opp) in enumerate(zip(points, opponents))
+    ]
+
+
+def _team_log(team, points, allowed, games=5):
+    return [
+        {"team": team, "date": f"2026-01-{day + 1:02d}", "points": points, "opp_points": allowed}
+        for day in range(games)
+    ]
+
+
+@pytest.mark.parametrize("query", [
+    "predict LeBron points next game",
+    "Celtics vs Knicks forecast",
+    "how many points will Tatum score next game",
+    "Lakers over/under tonight",
+    "who will win Celtics Knicks",
+])
+def test_prediction_queries(query):
+    assert is_prediction_query(query)
+
+
+@pytest.mark.parametrize("query", [
+    "When is the Lakers next game",
+    "Lakers unexpected win",
+    "most unpredictable teams this season",
+    "Celtics title odds",
+    "LeBron career points",
+])
+def test_not_prediction_queries(query):
+    assert not is_prediction_query(query)
+
+
+def test_projection_blends_ewm_average_and_trend():
+    points = [10 + 2 * i for i in range(10)]
+    [result] = project_entities(_frame(_player_log(points)))
+
+    alpha = 2 / (PREDICTION_CONFIG["ewm_span"] + 1)
+    decay = [(1 - alpha) ** i for i in range(len(points))]
+    ewm = sum(w * p for w, p in zip(decay, reversed(points))) / sum(decay)
+    average, trend = sum(points) / len(points), 30.0  # Exact line: one step past 28
+    weights = PREDICTION_CONFIG["weights"]
+    expected = weights["ewm"] * ewm + weights["average"] * average + weights["trend"] * trend
+
+    assert result["player"] == "Jayson Tatum"
+    assert result["games_used"] == 10
+    assert result["predicted_stats"]["points"] == pytest.approx(expected, abs=0.051)
+    assert result["recent_average"]["points"] == 19.0
+
+
+def test_short_log_falls_back_to_average_for_trend():
+    points = [10, 20, 30, 40]  # Fewer than min_trend_games
+    [result] = project_entities(_frame(_player_log(points)))
+    alpha = 2 / (PREDICTION_CONFIG["ewm_span"] + 1)
+    decay = [(1 - alpha) ** i for i in range(len(points))]
+    ewm = sum(w * p for w, p in zip(decay, reversed(points))) / sum(decay)
+    weights = PREDICTION_CONFIG["weights"]
+    expected = weights["ewm"] * ewm + (weights["average"] + weights["trend"]) * 25.0
+    assert result["predicted_stats"]["points"] == pytest.approx(expected, abs=0.051)
+
+
+def test_opponent_adjustment_is_shrunk_by_sample_size():
+    opponents = ["Celtics", "Knicks", "Knicks", "Celtics", "Knicks", "Knicks", "Celtics", "Knicks", "Knicks", "Knicks"]
+    points = [30 if opp == "Celtics" else 20 for opp in opponents]
+    frame = _frame(_player_log(points, opponents))
+
+    [base] = project_entities(frame)
+    [adjusted] = project_entities(frame, opponent="boston celtics")
+    # 3 games at +7 over the overall mean, shrunk by 3 / (3 + opponent_shrinkage_games)
+    shrink = 3 / (3 + PREDICTION_CONFIG["opponent_shrinkage_games"])
+    delta = adjusted["predicted_stats"]["points"] - base["predicted_stats"]["points"]
+    assert delta == pytest.approx(7 * shrink, abs=0.11)
+    assert adjusted["opponent"] == "boston celtics"
+
+
+def test_matchup_score_and_win_probability():
+    frame = _frame(_team_log("Celtics", 110, 100) + _team_log("Knicks", 100, 110))
+    matchup = predict_matchup(frame, "boston celtics", "new york knicks")
+    assert matchup["predicted_score"] == {"boston celtics": 110.0, "new york knicks": 100.0}
+    assert matchup["predicted_margin"] == 10.0
+    std = PREDICTION_CONFIG["margin_std"]
+    assert matchup["win_probability"] == pytest.approx(0.5 * (1 + math.erf(10 / (std * math.sqrt(2)))), abs=1e-3)
+
+    home = predict_matchup(frame, "boston celtics", "new york knicks", home_team="new york knicks")
+    assert home["predicted_margin"] == 10.0 - PREDICTION_CONFIG["home_court_points"]
+    assert home["win_probability"] < matchup["win_probability"]
+
+
+def test_predict_pairs_the_teams_in_the_query():
+    data = json.dumps(_team_log("Celtics", 110, 100) + _team_log("Knicks", 100, 110))
+    result = predict(data, "Celtics at Knicks prediction")
+    [matchup] = result["matchups"]
+    assert matchup["team"] == "boston celtics" and matchup["home_team"] == "new york knicks"
+
+
+def test_short_logs_are_dropped():
+    assert _frame(_player_log([20, 25])) is None
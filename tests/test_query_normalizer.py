@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+
+from query_normalizer import QueryIndex, parse_query
+
+TODAY = date(2026, 10, 18)
+
+
+def test_aliases_and_season_phrases():
+    parsed = parse_query("Steph 3s this year", today=TODAY)
+    assert parsed["canonical"] == "stephen curry three pointers 2026-27"
+    assert parsed["players"] == ["stephen curry"]
+    assert parsed["seasons"] == ["2026-27"]
+
+
+@pytest.mark.parametrize("query", ["LeBron career ppg", "LeBron career points per game", "LeBron points a game"])
+def test_per_game_wording_is_an_average(query):
+    assert "average" in parse_query(query)["qualifiers"]
+
+
+def test_surname_after_unknown_first_name_is_not_aliased():
+    assert parse_query("Seth Curry 3s this year", today=TODAY)["players"] == []
+    assert parse_query("is curry better than lebron")["players"] == ["stephen curry", "lebron james"]
+    assert parse_query("2023-24 curry points")["players"] == ["stephen curry"]
+
+
+def test_common_words_are_not_team_aliases():
+    parsed = parse_query("how many min did Jokic play")
+    assert parsed["teams"] == []
+    assert parsed["stats"] == ["minutes"]
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("LeBron career points", "LeBron career points per game"),
+        ("Curry 3s this year", "Seth Curry 3s this year"),
+        ("Curry 3s 2026-27", "Curry 3s 2025-26"),
+        ("Lakers wins 2023-24", "Lakers losses 2023-24"),
+        ("Giannis Antetokounmpo stats", "Giannis Antetokounmpo salary"),
+        ("LeBron James points", "LeBron James points allowed"),
+        ("rebounds", "offensive rebounds"),
+    ],
+)
+def test_index_keeps_different_questions_apart(first, second):
+    index = QueryIndex()
+    assert index.cache_key(first) != index.cache_key(second)
+
+
+def test_index_reuses_paraphrases():
+    index = QueryIndex()
+    key = index.cache_key("Steph Curry three pointers 2025-26")
+    assert index.cache_key("curry 3s in 2025-26") == key
+    assert index.cache_key("Lakers win 2023-24") == index.cache_key("the lakers wins in 2023-24")
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from query_normalizer import canonicalize_query
+from stats_store import StatsStore, current_season
+
+
+def _store(*records):
+    store = StatsStore(":memory:")
+    store.ingest(json.dumps(list(records)))
+    return store
+
+
+@pytest.fixture
+def lebron():
+    return _store({"player": "LeBron James", "season": "2023-24", "points": 25.7, "rebounds": 7.3})
+
+
+def test_answers_fully_covered_query(lebron):
+    records = lebron.lookup("LeBron points 2023-24")
+    assert records == [{"player": "LeBron James", "season": "2023-24", "points": 25.7, "rebounds": 7.3}]
+
+
+def test_full_stored_name_without_alias():
+    store = _store({"player": "Jalen Brunson", "season": "2023-24", "points": 28.7})
+    assert store.lookup("jalen brunson points 2023-24") is not None
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "James Harden points 2023-24",  # shares a name part, different player
+        "LeBron points vs Harden 2023-24",  # second player isn't stored
+        "Seth Curry points 2023-24",  # unknown player
+        "LeBron turnovers 2023-24",  # stat not stored
+        "LeBron 2023-24 triple doubles",
+        "LeBron fg% 2023-24",
+        "LeBron plus minus 2023-24",  # stat the parser doesn't know
+        "LeBron points 2023-24 playoffs",  # stored rows are regular season
+        "LeBron points in the 2023-24 finals",
+        "LeBron total points 2023-24",  # only per-game columns stored
+        "LeBron points 2022-23",  # season not stored
+        "LeBron points tonight",  # time-sensitive
+        "LeBron last 10 games points 2023-24",
+    ],
+)
+def test_partially_covered_queries_miss(lebron, query):
+    assert lebron.lookup(query) is None
+
+
+def test_name_part_does_not_cross_players():
+    store = _store(
+        {"player": "LeBron James", "season": "2023-24", "points": 25.7},
+        {"player": "James Harden", "season": "2023-24", "points": 16.6},
+    )
+    [record] = store.lookup("James Harden points 2023-24")
+    assert record["player"] == "James Harden"
+    assert len(store.lookup("LeBron vs Harden points 2023-24")) == 2
+
+
+def test_comparison_needs_every_side():
+    store = _store({"player": "LeBron James", "season": "2023-24", "points": 25.7})
+    assert store.lookup("compare LeBron points 2023-24") is None
+
+
+def test_team_nickname_resolves_to_stored_team():
+    store = _store({"team": "Lakers", "season": "2023-24", "wins": 47})
+    assert store.lookup("Los Angeles Lakers wins 2023-24")[0]["team"] == "Lakers"
+
+
+def test_total_and_average_columns():
+    store = _store(
+        {"player": "LeBron James", "season": "career", "total_points": 40474, "points": 27.1}
+    )
+    assert store.lookup("LeBron career total points") is not None
+    assert store.lookup("LeBron career points") is not None
+    totals_only = _store({"player": "LeBron James", "season": "career", "total_points": 40474})
+    assert totals_only.lookup("LeBron career average points") is None
+
+
+def test_ambiguous_season_without_season_in_query():
+    store = _store(
+        {"player": "LeBron James", "season": "2022-23", "points": 28.9},
+        {"player": "LeBron James", "season": "2023-24", "points": 25.7},
+    )
+    assert store.lookup("LeBron points") is None
+    assert store.lookup("LeBron points 2022-23")[0]["points"] == 28.9
+
+
+def test_canonicalized_stat_names_must_be_stored(lebron):
+    # main passes canonicalize_query() output: "fg%" -> "field goal percentage"
+    assert lebron.lookup(canonicalize_query("LeBron fg% 2023-24")) is None
+    shooting = _store({"player": "LeBron James", "season": "2023-24", "fg%": 54.0})
+    assert shooting.lookup(canonicalize_query("LeBron fg% 2023-24")) is not None
+
+
+def test_no_season_means_current_season_only():
+    store = _store({"player": "LeBron James", "season": "2019-20", "points": 25.3})
+    assert store.lookup("LeBron points") is None
+    store.ingest(json.dumps([{"player": "LeBron James", "season": current_season(), "points": 24.0}]))
+    assert store.lookup("LeBron points")[0]["season"] == current_season()
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "LeBron playoff points 2023-24",
+        "LeBron last 10 games points",
+        "LeBron points against the Celtics 2023-24",
+        "LeBron home points 2023-24",
+        "LeBron points tonight",
+    ],
+)
+def test_split_data_is_not_ingested(query):
+    store = StatsStore(":memory:")
+    data = json.dumps([{"player": "LeBron James", "season": "2023-24", "points": 31.0}])
+    assert store.ingest(data, query) == 0
+    assert store.ingest(data, "LeBron points 2023-24") == 1
+
+
+def test_vs_needs_entities_of_one_kind():
+    store = _store(
+        {"player": "LeBron James", "season": "2023-24", "points": 25.7},
+        {"team": "Boston Celtics", "season": "2023-24", "points": 120.6},
+    )
+    assert store.lookup("LeBron points against the Celtics 2023-24") is None
@@ -0,0 +1,161 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import upstream as upstream_module
+from upstream import CircuitBreaker, TokenBucket, UpstreamClient, UpstreamUnavailable
+
+CONFIG = {
+    "requests_per_minute": {"default": 6000},
+    "burst": 100,
+    "stage_timeouts": {"default": 1},
+    "max_attempts": 3,
+    "backoff_base_seconds": 0.01,
+    "backoff_max_seconds": 8,
+    "breaker_failure_threshold": 2,
+    "breaker_reset_seconds": 30,
+}
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff sleeps instead of waiting them out."""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(upstream_module.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def _flaky(*outcomes):
+    """make_call() factory: raise or return each outcome in turn."""
+    calls = []
+
+    def make_call():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+
+        async def run():
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return run()
+
+    return make_call, calls
+
+
+def test_token_bucket_queues_past_burst():
+    bucket = TokenBucket(requests_per_minute=60, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_token_bucket_drain_holds_back_every_caller():
+    bucket = TokenBucket(requests_per_minute=60, burst=5)
+    bucket.drain(3)
+    assert bucket.reserve() == pytest.approx(4.0, abs=0.05)
+
+
+def test_breaker_opens_then_lets_one_probe_through(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(upstream_module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] += 31
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_call_retries_retryable_errors(sleeps):
+    client = UpstreamClient(CONFIG, workers=1)
+    make_call, calls = _flaky(FakeAPIError(503), "ok")
+    assert asyncio.run(client.call("m", "data", make_call)) == "ok"
+    assert len(calls) == 2 and len(sleeps) == 1
+    assert client.breaker("m").state == "closed"
+    assert client.stats()["retries"] == 1
+
+
+def test_call_does_not_retry_bad_requests(sleeps):
+    client = UpstreamClient(CONFIG, workers=1)
+    make_call, calls = _flaky(FakeAPIError(400), "ok")
+    with pytest.raises(FakeAPIError):
+        asyncio.run(client.call("m", "data", make_call))
+    assert len(calls) == 1 and not sleeps
+    assert client.breaker("m").failures == 0
+
+
+def test_call_honours_retry_after_and_drains_the_bucket(sleeps):
+    client = UpstreamClient(CONFIG, workers=1)
+    make_call, _ = _flaky(FakeAPIError(429, retry_after=3), "ok")
+    assert asyncio.run(client.call("m", "data", make_call)) == "ok"
+    assert sleeps[0] >= 3
+    assert client.bucket("m").tokens < 0
+    assert client.stats()["rate_limited"] == 1
+
+
+def test_call_gives_up_and_opens_breaker(sleeps):
+    client = UpstreamClient(dict(CONFIG, breaker_failure_threshold=3), workers=1)
+    make_call, calls = _flaky(FakeAPIError(500), FakeAPIError(500), FakeAPIError(500))
+    with pytest.raises(FakeAPIError):
+        asyncio.run(client.call("m", "data", make_call))
+    assert len(calls) == 3
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(client.call("m", "data", _flaky("ok")[0]))
+
+
+def _stream_factory(*runs):
+    """make_stream() factory: each run yields its items, then raises if it ends in an exception."""
+    started = []
+
+    def make_stream():
+        run = runs[len(started)]
+        started.append(run)
+
+        async def gen():
+            for item in run:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        return gen()
+
+    return make_stream, started
+
+
+async def _collect(client, make_stream):
+    return [item async for item in client.stream("m", "orchestrator", make_stream)]
+
+
+def test_stream_retries_before_first_item(sleeps):
+    client = UpstreamClient(CONFIG, workers=1)
+    make_stream, started = _stream_factory([FakeAPIError(502)], ["a", "b"])
+    assert asyncio.run(_collect(client, make_stream)) == ["a", "b"]
+    assert len(started) == 2 and len(sleeps) == 1
+
+
+def test_stream_does_not_retry_after_first_item(sleeps):
+    client = UpstreamClient(CONFIG, workers=1)
+    make_stream, started = _stream_factory(["a", FakeAPIError(502)], ["b"])
+    with pytest.raises(FakeAPIError):
+        asyncio.run(_collect(client, make_stream))
+    assert len(started) == 1 and not sleeps
@@ -0,0 +1,269 @@
+import asyncio
+import random
+import threading
+import time
+
+import openai
+
+from config import UPSTREAM_CONFIG, DEPLOYMENT_CONFIG
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised without calling the model while its circuit breaker is open."""
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+def is_upstream_failure(error) -> bool:
+    """True when a model call failed for reasons the pipeline should degrade around."""
+    return isinstance(error, UpstreamUnavailable) or is_retryable(error)
+
+
+def _retry_after(error):
+    """Seconds from a 429/503 ``Retry-After`` header, if the error carries one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Requests-per-minute limiter shared by every caller of one model.
+
+    Callers reserve a token and sleep until it is due, so a burst queues up
+    locally instead of turning into a storm of 429s upstream.
+    """
+
+    def __init__(self, requests_per_minute, burst):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token; returns how many seconds to wait before using it."""
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def drain(self, seconds):
+        """After a 429, hold back every caller for ``seconds``, not just the one retrying."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, calls are rejected immediately. After ``reset_seconds`` one
+    probe call is let through (half-open): success closes the breaker, failure
+    re-opens it.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_seconds:
+                return False
+            # One probe at a time; a probe that never reports back expires
+            if self._probe_at is not None and now - self._probe_at < self.reset_seconds:
+                return False
+            self._probe_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_at = None
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """Rate limiting, per-stage timeouts, jittered retries and a circuit
+    breaker around model calls, keyed by model name.
+
+    Limits are per process, so with ``workers`` processes each gets an even
+    share of the configured requests per minute.
+    """
+
+    def __init__(self, config=UPSTREAM_CONFIG, workers=DEPLOYMENT_CONFIG["workers"]):
+        self.config = config
+        self.workers = max(1, workers)
+        self._buckets = {}
+        self._breakers = {}
+        self._counts = {"calls": 0, "retries": 0, "timeouts": 0, "rate_limited": 0, "rejected": 0, "degraded": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def bucket(self, model) -> TokenBucket:
+        with self._lock:
+            if model not in self._buckets:
+                limits = self.config["requests_per_minute"]
+                rpm = limits.get(model, limits["default"]) / self.workers
+                self._buckets[model] = TokenBucket(rpm, max(1, self.config["burst"] // self.workers))
+            return self._buckets[model]
+
+    def breaker(self, model) -> CircuitBreaker:
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(
+                    self.config["breaker_failure_threshold"], self.config["breaker_reset_seconds"]
+                )
+            return self._breakers[model]
+
+    def timeout_for(self, stage) -> float:
+        timeouts = self.config["stage_timeouts"]
+        return timeouts.get(stage, timeouts["default"])
+
+    def _backoff(self, attempt, error) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        cap = min(self.config["backoff_max_seconds"], self.config["backoff_base_seconds"] * 2 ** attempt)
+        delay = random.uniform(0, cap)
+        retry_after = _retry_after(error)
+        return max(delay, min(retry_after, self.config["backoff_max_seconds"])) if retry_after else delay
+
+    async def admit(self, model):
+        """Breaker check + rate limit for calls made outside call(), e.g. streaming."""
+        if not self.breaker(model).allow():
+            self._count("rejected")
+            raise UpstreamUnavailable(f"{model} is temporarily unavailable (circuit open)")
+        await self.bucket(model).acquire()
+
+    async def call(self, model, stage, make_call):
+        """Await ``make_call()`` (a coroutine factory) under the model's limits.
+
+        Retryable failures (timeouts, connection errors, 429/5xx) are retried
+        up to ``max_attempts`` times and count toward the model's breaker;
+        the last one is re-raised.
+        """
+        breaker = self.breaker(model)
+        for attempt in range(self.config["max_attempts"]):
+            await self.admit(model)
+            self._count("calls")
+            try:
+                result = await asyncio.wait_for(make_call(), self.timeout_for(stage))
+            except Exception as e:
+                if not is_retryable(e):
+                    breaker.record_success()  # The model answered; the request was bad
+                    raise
+                breaker.record_failure()
+                if isinstance(e, asyncio.TimeoutError):
+                    self._count("timeouts")
+                if getattr(e, "status_code", None) == 429:
+                    self._count("rate_limited")
+                if attempt + 1 >= self.config["max_attempts"]:
+                    raise
+                delay = self._backoff(attempt, e)
+                if getattr(e, "status_code", None) == 429:
+                    self.bucket(model).drain(delay)
+                self._count("retries")
+                print(f"🔁 {stage} call to {model} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+
+    async def stream(self, model, stage, make_stream):
+        """Yield from ``make_stream()`` (an async iterator factory) under the model's limits.
+
+        The whole stream gets the stage timeout. Retryable failures count
+        toward the breaker like call(); they are retried only while nothing
+        has been yielded yet, since a partly sent answer can't be taken back.
+        """
+        breaker = self.breaker(model)
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.config["max_attempts"]):
+            await self.admit(model)
+            self._count("calls")
+            deadline = loop.time() + self.timeout_for(stage)
+            iterator = make_stream().__aiter__()
+            started = False
+            try:
+                while True:
+                    try:
+                        item = await asyncio.wait_for(iterator.__anext__(), max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield item
+            except Exception as e:
+                if not is_retryable(e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if isinstance(e, asyncio.TimeoutError):
+                    self._count("timeouts")
+                if getattr(e, "status_code", None) == 429:
+                    self._count("rate_limited")
+                if started or attempt + 1 >= self.config["max_attempts"]:
+                    raise
+                delay = self._backoff(attempt, e)
+                if getattr(e, "status_code", None) == 429:
+                    self.bucket(model).drain(delay)
+                self._count("retries")
+                print(f"🔁 {stage} stream from {model} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return
+
+    def note_degraded(self):
+        """Count a request answered in degraded mode (skipped stage or fallback answer)."""
+        self._count("degraded")
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+            counts = dict(self._counts)
+        counts["breakers"] = {model: b.state for model, b in breakers.items()}
+        return counts
+
+
+upstream = UpstreamClient()
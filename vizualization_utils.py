@@ -1,77 +1,264 @@
-import matplotlib.pyplot as plt
-import numpy as np
-import base64, io, re, matplotlib
-matplotlib.use("Agg")
+import base64, hashlib, io, json, re, threading
+from contextlib import contextmanager
+from record_utils import ENTITY_KEYS, GAME_KEYS, extract_records, extract_rows, is_game_row, stat_key, to_number
 
-def fig_to_base64(fig):
+# No pyplot: every chart draws on its own Figure/FigureCanvasAgg, so charts
+# can render concurrently from a thread pool. matplotlib and numpy are only
+# imported when the first chart is drawn, keeping them out of server start-up.
+CHART_FIGSIZES = {"bar": (7, 4), "line": (7, 4), "pie": (5, 5), "scatter": (7, 5), "table": (7, 4)}
+
+
+class FigurePool:
+    """Reusable Agg figures per chart type, handed to one thread at a time."""
+
+    def __init__(self, max_idle_per_type=4):
+        self.max_idle_per_type = max_idle_per_type
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def figure(self, chart_type):
+        with self._lock:
+            idle = self._idle.setdefault(chart_type, [])
+            fig = idle.pop() if idle else None
+        if fig is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+            fig = Figure(figsize=CHART_FIGSIZES.get(chart_type, (7, 4)))
+            FigureCanvasAgg(fig)
+        try:
+            yield fig
+        finally:
+            fig.clear()
+            with self._lock:
+                idle = self._idle.setdefault(chart_type, [])
+                if len(idle) < self.max_idle_per_type:
+                    idle.append(fig)
+
+
+figure_pool = FigurePool()
+
+
+def fig_to_png(fig):
     buf = io.BytesIO()
     fig.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    img = base64.b64encode(buf.getvalue()).decode("utf-8")
-    plt.close(fig)
-    return img
-
-def create_bar_chart(data):
-    """Fixed: Proper Y-axis numbers, readable spacing."""
-    plt.close("all")
-    labels = data.get("labels", [])
-    series = {k: v for k, v in data.items() if isinstance(v, list) and all(isinstance(x, (int, float)) for x in v)}
+    return buf.getvalue()
+
+def fig_to_base64(fig):
+    return base64.b64encode(fig_to_png(fig)).decode("utf-8")
+
+def _export(fig, raw):
+    """PNG bytes when ``raw`` is set, base64 text otherwise."""
+    return fig_to_png(fig) if raw else fig_to_base64(fig)
+
+class ChartData:
+    """Chart series coerced once into a 2-D float array (series x labels).
+
+    Non-numeric or missing values become NaN and every series is padded or
+    cut to the length of ``labels``, so renderers work on whole arrays
+    instead of re-validating Python lists per series.
+    """
+
+    def __init__(self, title, labels, names, values, x_label="", y_label=""):
+        self.title = title
+        self.labels = labels
+        self.names = names
+        self.values = values
+        self.x_label = x_label
+        self.y_label = y_label
+
+    @classmethod
+    def from_spec(cls, data):
+        import numpy as np
+
+        labels = [str(label) for label in data.get("labels") or []]
+        series = {
+            str(k): v for k, v in data.items()
+            if isinstance(v, list) and k not in ("labels", "datasets")
+        }
+        width = len(labels) or max((len(v) for v in series.values()), default=0)
+
+        values = np.full((len(series), width), np.nan)
+        for i, raw_values in enumerate(series.values()):
+            row = _coerce_row(raw_values[:width])
+            values[i, :len(row)] = row
+
+        keep = ~np.isnan(values).all(axis=1) if width else np.zeros(len(series), dtype=bool)
+        names = [name for name, kept in zip(series, keep) if kept]
+        return cls(
+            data.get("title", ""),
+            labels or [str(i + 1) for i in range(width)],
+            names,
+            values[keep],
+            data.get("x_axis_label", ""),
+            data.get("y_axis_label", ""),
+        )
+
+    @property
+    def empty(self):
+        return self.values.size == 0
 
-    if not labels or not series:
+
+def _coerce_row(values):
+    """Float array for one series; anything non-numeric becomes NaN."""
+    import numpy as np
+
+    try:
+        row = np.asarray(values, dtype=float)
+        if row.ndim == 1:
+            return row
+    except (TypeError, ValueError):
+        pass
+    # Mixed content like "61.8%", "N/A" or nested lists: coerce element-wise
+    return np.array([to_number(v) for v in values], dtype=float)
+
+
+def _chart_data(data):
+    return data if isinstance(data, ChartData) else ChartData.from_spec(data)
+
+
+def _set_category_ticks(ax, x, labels):
+    """Label the x axis, thinning ticks on long (e.g. career-long) axes."""
+    step = max(1, len(labels) // 20)
+    ax.set_xticks(x[::step])
+    ax.set_xticklabels(labels[::step], rotation=30, ha="right")
+
+
+def _legend(ax, handles, names):
+    if names:
+        ax.legend(handles, names, fontsize="small", ncol=1 + len(names) // 12)
+
+
+def create_bar_chart(data, raw=False, stacked=False):
+    """Grouped (or stacked) bars: one group per label, one bar per series."""
+    chart = _chart_data(data)
+    if chart.empty:
         return None
 
-    fig, ax = plt.subplots(figsize=(7, 4))
-    width = 0.8 / max(len(series), 1)
-    x = np.arange(len(labels))
+    import numpy as np
 
-    for i, (label, values) in enumerate(series.items()):
-        ax.bar(x + i * width, values, width, label=label)
+    n_series, n_labels = chart.values.shape
+    x = np.arange(n_labels)
+    heights = np.nan_to_num(chart.values)
+    if stacked:
+        width = 0.8
+        positions = np.broadcast_to(x, heights.shape)
+        bottoms = np.vstack([np.zeros(n_labels), np.cumsum(heights, axis=0)[:-1]])
+    else:
+        width = 0.8 / n_series
+        positions = x + (np.arange(n_series) - (n_series - 1) / 2)[:, None] * width
+        bottoms = np.zeros_like(heights)
 
-    ax.set_title(data.get("title", "Bar Chart"))
-    ax.set_xticks(x + width * len(series) / 2)
-    ax.set_xticklabels(labels, rotation=30, ha='right')
-    ax.set_ylabel("Value")  # ✅ fix: show numeric axis name
-    ax.legend()
-    plt.tight_layout()
-    return fig_to_base64(fig)
+    with figure_pool.figure("bar") as fig:
+        ax = fig.subplots()
+        bars = [
+            ax.bar(positions[i], heights[i], width, bottom=bottoms[i])
+            for i in range(n_series)
+        ]
+        ax.set_title(chart.title or "Bar Chart")
+        _set_category_ticks(ax, x, chart.labels)
+        ax.set_xlabel(chart.x_label)
+        ax.set_ylabel(chart.y_label or "Value")  # ✅ fix: show numeric axis name
+        _legend(ax, bars, chart.names)
+        fig.tight_layout()
+        return _export(fig, raw)
 
-def create_line_chart(data):
-    plt.close("all")
-    labels = data.get("labels", [])
-    if not labels:
+def create_line_chart(data, raw=False):
+    """All series drawn in one plot call; NaN leaves a gap in that line."""
+    chart = _chart_data(data)
+    if chart.empty:
         return None
 
-    fig, ax = plt.subplots(figsize=(7, 4))
-    for key, values in data.items():
-        if isinstance(values, list) and all(isinstance(x, (int, float)) for x in values):
-            ax.plot(labels, values, marker="o", label=key)
+    import numpy as np
 
-    ax.set_title(data.get("title", "Line Chart"))
-    ax.set_ylabel("Value")
-    ax.legend()
-    plt.tight_layout()
-    return fig_to_base64(fig)
+    x = np.arange(len(chart.labels))
+    with figure_pool.figure("line") as fig:
+        ax = fig.subplots()
+        lines = ax.plot(x, chart.values.T, marker="o" if len(x) <= 30 else None)
+        ax.set_title(chart.title or "Line Chart")
+        _set_category_ticks(ax, x, chart.labels)
+        ax.set_xlabel(chart.x_label)
+        ax.set_ylabel(chart.y_label or "Value")
+        _legend(ax, lines, chart.names)
+        fig.tight_layout()
+        return _export(fig, raw)
 
-def create_pie_chart(data):
-    plt.close("all")
-    stats = {k: v for k, v in data.items() if isinstance(v, (int, float))}
-    if not stats:
+def create_scatter_chart(data, raw=False):
+    """First series against the second, each point annotated with its label."""
+    chart = _chart_data(data)
+    if chart.empty:
         return None
 
-    fig, ax = plt.subplots(figsize=(5, 5))
-    ax.pie(stats.values(), labels=stats.keys(), autopct="%1.1f%%", startangle=90)
-    ax.set_title(data.get("title", "Pie Chart"))
-    plt.tight_layout()
-    return fig_to_base64(fig)
+    import numpy as np
 
-def generate_chart_from_json(data):
-    """Auto-detect chart type + filter out invalid Y-axis values."""
-    plt.close("all")
+    if len(chart.names) >= 2:
+        xs, ys = chart.values[0], chart.values[1]
+        x_label, y_label = chart.x_label or chart.names[0], chart.y_label or chart.names[1]
+    else:
+        xs, ys = np.arange(len(chart.labels)), chart.values[0]
+        x_label, y_label = chart.x_label, chart.y_label or chart.names[0]
+
+    with figure_pool.figure("scatter") as fig:
+        ax = fig.subplots()
+        ax.scatter(xs, ys)
+        if len(chart.labels) <= 30:
+            for label, px, py in zip(chart.labels, xs, ys):
+                if not (np.isnan(px) or np.isnan(py)):
+                    ax.annotate(label, (px, py), textcoords="offset points", xytext=(4, 4), fontsize="small")
+        ax.set_title(chart.title or "Scatter Plot")
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(y_label)
+        fig.tight_layout()
+        return _export(fig, raw)
+
+def create_table_chart(data, raw=False):
+    """Stats table: a row per label, a column per series, '—' for missing."""
+    chart = _chart_data(data)
+    if chart.empty:
+        return None
+
+    import numpy as np
+
+    cells = chart.values.T
+    text = np.where(np.isnan(cells), "—", np.char.mod("%g", cells))
+
+    with figure_pool.figure("table") as fig:
+        fig.set_size_inches(max(4, 1.4 * (len(chart.names) + 1)), 0.8 + 0.3 * len(chart.labels))
+        ax = fig.subplots()
+        ax.axis("off")
+        table = ax.table(cellText=text.tolist(), rowLabels=chart.labels, colLabels=chart.names, loc="center")
+        table.auto_set_font_size(False)
+        table.set_fontsize(9)
+        ax.set_title(chart.title or "NBA Stats")
+        return _export(fig, raw)
+
+def create_pie_chart(data, raw=False):
+    stats = {k: v for k, v in data.items() if isinstance(v, (int, float))}
+    if not stats:
+        # Single series over labels, e.g. shot distribution by zone
+        chart = _chart_data(data)
+        if chart.empty:
+            return None
+        values = chart.values[0]
+        keep = values > 0  # NaN compares False
+        stats = dict(zip((l for l, k in zip(chart.labels, keep) if k), values[keep].tolist()))
+        if not stats:
+            return None
+
+    with figure_pool.figure("pie") as fig:
+        ax = fig.subplots()
+        ax.pie(list(stats.values()), labels=list(stats.keys()), autopct="%1.1f%%", startangle=90)
+        ax.set_title(data.get("title", "Pie Chart"))
+        fig.tight_layout()
+        return _export(fig, raw)
 
+def normalize_chart_spec(data):
+    """Flatten ``datasets`` or the visualization agent's nested ``data`` into
+    top-level series; None if not a chart spec."""
     if not isinstance(data, dict):
         return None
 
-    # Normalize
     if "datasets" in data and isinstance(data["datasets"], list):
         normalized = {
             "title": data.get("title", "NBA Chart"),
@@ -82,32 +269,207 @@ def generate_chart_from_json(data):
             label = ds.get("label", "Series")
             values = ds.get("data", [])
             normalized[label] = values
-        data = normalized
+        return normalized
+
+    if isinstance(data.get("data"), dict):
+        config = data.get("config") if isinstance(data.get("config"), dict) else {}
+        normalized = {
+            "title": data.get("title", "NBA Chart"),
+            "type": data.get("type") or data.get("visualization_type"),
+            "x_axis_label": config.get("x_axis_label", ""),
+            "y_axis_label": config.get("y_axis_label", ""),
+        }
+        normalized.update(data["data"])
+        return normalized
+    return data
+
+def chart_spec_hash(data):
+    """Content address of a chart: sha256 of its normalized spec."""
+    spec = normalize_chart_spec(data)
+    if spec is None:
+        return None
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def generate_chart_from_json(data, raw=False):
+    """Auto-detect chart type + filter out invalid Y-axis values."""
+    data = normalize_chart_spec(data)
+    if data is None:
+        return None
 
     labels = data.get("labels", [])
     title = data.get("title", "").lower()
-    series = {k: v for k, v in data.items() if isinstance(v, list)}
+    chart_type = (data.get("type") or "").lower()
+    if chart_type.startswith("pie"):
+        return create_pie_chart(data, raw)
+
+    chart = ChartData.from_spec(data)
+    n_series = len(chart.names)
 
     # 🔍 Stronger auto-detection
-    chart_type = (data.get("type") or "").lower()
     if not chart_type:
-        if len(series) == 1 and len(labels) <= 6:
+        if n_series == 1 and len(labels) <= 6:
             chart_type = "pie"
         elif any(re.search(r"(20\d{2}|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|game|week)", str(l).lower()) for l in labels):
             chart_type = "line"
         elif "percentage" in title or "distribution" in title or "share" in title:
             chart_type = "pie"
-        elif len(series) > 1:
-            chart_type = "bar"
         else:
             chart_type = "bar"
 
     # ✅ Call correct chart
-    if chart_type.startswith("bar"):
-        return create_bar_chart(data)
+    if chart_type.startswith("pie"):
+        return create_pie_chart(data, raw)
     elif chart_type.startswith("line"):
-        return create_line_chart(data)
-    elif chart_type.startswith("pie"):
-        return create_pie_chart(data)
+        return create_line_chart(chart, raw)
+    elif chart_type.startswith("scatter"):
+        return create_scatter_chart(chart, raw)
+    elif chart_type.startswith("table"):
+        return create_table_chart(chart, raw)
+    elif "stacked" in chart_type:
+        return create_bar_chart(chart, raw, stacked=True)
+    else:
+        return create_bar_chart(chart, raw)
+
+# Fast path vs visualization-agent fallback counts for compile_chart_spec()
+_spec_counts = {"fast_path": 0, "fallback": 0}
+_spec_counts_lock = threading.Lock()
+
+def _count_spec(outcome):
+    with _spec_counts_lock:
+        _spec_counts[outcome] += 1
+
+def chart_spec_stats():
+    with _spec_counts_lock:
+        total = _spec_counts["fast_path"] + _spec_counts["fallback"]
+        return dict(
+            _spec_counts,
+            fast_path_rate=round(_spec_counts["fast_path"] / total, 4) if total else 0.0,
+        )
+
+def _stat_label(stat):
+    return stat.replace("_pct", "%").replace("_", " ").upper()
+
+# Numeric columns that identify or order rows rather than measure anything
+NON_STAT_KEYS = {"rank", "rk", "ranking", "id", "no", "number", "jersey", "year"}
+ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def _is_stat(key):
+    return key not in NON_STAT_KEYS and not key.endswith("_id")
+
+
+def _game_label(row):
+    """'2026-01-05 vs BOS' from a game row's date and opponent fields."""
+    fields = {stat_key(k): v for k, v in row.items()}
+    date = next((str(fields[k]) for k in ("date", "game_date") if fields.get(k)), "")
+    opponent = next((str(fields[k]) for k in ("opponent", "opp") if fields.get(k)), "")
+    if opponent and not opponent.lower().startswith(("vs", "@", "at ")):
+        opponent = f"vs {opponent}"
+    return " ".join(part for part in (date, opponent) if part) or str(fields.get("game_id", ""))
+
+
+def _game_log_spec(rows):
+    """Line chart of one entity's game log, a point per game; None otherwise."""
+    entities = {next((row[k] for k in ENTITY_KEYS if isinstance(row.get(k), str)), None) for row in rows}
+    if len(entities) != 1 or None in entities or not all(is_game_row(row) for row in rows):
+        return None  # Mixed or multi-entity game rows: leave them to the agent
+
+    games = []
+    for row in rows:
+        values = {
+            stat_key(k): to_number(v)
+            for k, v in row.items()
+            if k not in ENTITY_KEYS and stat_key(k) not in GAME_KEYS and stat_key(k) != "season"
+        }
+        games.append((_game_label(row), {k: v for k, v in values.items() if v is not None and _is_stat(k)}))
+    stats = [s for s in games[0][1] if all(s in g for _, g in games[1:])]
+    if not stats:
+        return None
+    if all(ISO_DATE_RE.match(label) for label, _ in games):
+        games.sort(key=lambda game: game[0])  # Logs usually come newest first
+    return {
+        "title": f"{entities.pop()} Game Log",
+        "type": "line",
+        "labels": [label for label, _ in games],
+        "datasets": [{"label": _stat_label(s), "data": [g[s] for _, g in games]} for s in stats],
+    }
+
+def compile_chart_spec(structured_data):
+    """Build chart JSON straight from player/team stat records.
+
+    One entity over several seasons becomes a line chart (a series per stat),
+    several entities over several seasons a line per entity of the first
+    shared stat; one entity's game log a line over its games; otherwise a
+    grouped bar chart of the shared stats, a series per record. Rank and id
+    columns are never plotted. Returns None when the data isn't clean
+    records, so the caller can fall back to the visualization agent.
+    """
+    rows = extract_rows(structured_data)
+    if any(is_game_row(row) for row in rows):
+        spec = _game_log_spec(rows)
+        _count_spec("fast_path" if spec else "fallback")
+        return spec
+
+    records = extract_records(structured_data)
+    if not records:
+        _count_spec("fallback")
+        return None
+
+    stats = [
+        s for s in records[0]["stats"]
+        if _is_stat(s) and all(s in r["stats"] for r in records[1:])
+    ]
+    if not stats:
+        _count_spec("fallback")
+        return None
+
+    entities = list(dict.fromkeys(r["entity"] for r in records))
+    seasons = [r["season"] for r in records]
+
+    if len(entities) == 1 and len(records) > 1 and all(seasons) and len(set(seasons)) == len(records):
+        records = sorted(records, key=lambda r: r["season"])
+        spec = {
+            "title": f"{entities[0]} by Season",
+            "type": "line",
+            "labels": [r["season"] for r in records],
+            "datasets": [
+                {"label": _stat_label(s), "data": [r["stats"][s] for r in records]}
+                for s in stats
+            ],
+        }
+    elif len(entities) > 1 and all(seasons) and len({(r["entity"], r["season"]) for r in records}) == len(records) \
+            and len(set(seasons)) > 1:
+        # Career progression of several players: a line per player over the
+        # union of their seasons; gaps where a player has no row (see ChartData)
+        labels = sorted(set(seasons))
+        by_entity = {e: {} for e in entities}
+        for r in records:
+            by_entity[r["entity"]][r["season"]] = r["stats"][stats[0]]
+        spec = {
+            "title": f"{_stat_label(stats[0])} by Season",
+            "type": "line",
+            "labels": labels,
+            "datasets": [
+                {"label": e, "data": [values.get(season) for season in labels]}
+                for e, values in by_entity.items()
+            ],
+        }
     else:
-        return create_bar_chart(data)
+        def series_label(r):
+            if len(entities) < len(records) and r["season"]:
+                return f"{r['entity']} ({r['season']})"
+            return r["entity"]
+
+        spec = {
+            "title": " vs ".join(entities) if len(entities) > 1 else f"{entities[0]} Stats",
+            "type": "bar",
+            "labels": [_stat_label(s) for s in stats],
+            "datasets": [
+                {"label": series_label(r), "data": [r["stats"][s] for s in stats]}
+                for r in records
+            ],
+        }
+
+    _count_spec("fast_path")
+    return spec